@@ -1,12 +1,35 @@
 from flask import Flask, render_template, request, send_file
 import pandas as pd
-import pdfplumber
+import importlib.util
+import logging
 import os
+import sys
+import tempfile
+from bisect import bisect_right
 from datetime import datetime
 
+from werkzeug.utils import secure_filename
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_backends import BACKENDS, backends_faster_than, open_pdf, select_backend  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Workbooks up to this size stay in memory; bigger ones spill to an anonymous temp file
+SPOOL_MAX_BYTES = int(os.environ.get('MPESYNC_SPOOL_MAX_BYTES', 16 * 1024 * 1024))
+
+# Largest accepted upload; bigger requests are answered with 413 (0 disables the limit)
+MAX_UPLOAD_BYTES = int(os.environ.get('MPESYNC_TABLE_MAX_UPLOAD_BYTES', 64 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES or None
+
+# 'auto' uses the fastest installed backend whose rows match pdfplumber's on the first pages
+PDF_BACKEND = os.environ.get('MPESYNC_PDF_BACKEND', 'auto')
+
+# xlsxwriter writes large workbooks several times faster than openpyxl
+EXCEL_ENGINE = os.environ.get('MPESYNC_EXCEL_ENGINE') or (
+    'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl')
 
 
 @app.route('/')
@@ -36,133 +59,423 @@ def convert_file():
     if file.filename == '':
         return 'No selected file'
 
-    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(filepath)
-
-    transactions = extract_transactions(filepath)
-    excel_path = convert_to_excel(transactions, file.filename)
-
-    return send_file(excel_path, as_attachment=True)
-
-
-def extract_transactions(pdf_path):
-    transactions = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_table()
-            if tables:
-                for row in tables:
-                    if any(row):
-                        transactions.append(row)
-    return transactions
-
-
-def calculate_daily_totals(df):
-    # Create a copy of the DataFrame to avoid modifying the original
-    df_copy = df.copy()
-
-    # Remove rows where Completion Time is not a date string
-    df_copy = df_copy[df_copy['Completion Time'].str.contains(r'\d{4}-\d{2}-\d{2}', na=False)]
-
-    # Extract just the date part from the Completion Time
-    df_copy['Date'] = df_copy['Completion Time'].str.extract(r'(\d{4}-\d{2}-\d{2})')
-
-    # Convert Paid In and Withdrawn to numeric, handling commas and missing values
-    df_copy['Paid In'] = df_copy['Paid In'].replace('', '0')
-    df_copy['Withdrawn'] = df_copy['Withdrawn'].replace('', '0')
-    df_copy['Paid In'] = pd.to_numeric(df_copy['Paid In'].str.replace(',', ''), errors='coerce').fillna(0)
-
-    # Handling Withdrawn amounts: Convert them to negative if they aren't already
-    df_copy['Withdrawn'] = pd.to_numeric(df_copy['Withdrawn'].str.replace(',', ''), errors='coerce').fillna(0)
-    df_copy['Withdrawn'] = df_copy['Withdrawn'].apply(lambda x: -x if x > 0 else x)
-
-    # Group by date and calculate totals
-    daily_totals = df_copy.groupby('Date').agg({
-        'Paid In': 'sum',
-        'Withdrawn': 'sum'
-    }).reset_index()
-
-    # Calculate net amount
-    # Since Withdrawn is now correctly negative, we add it to Paid In
-    daily_totals['Net Amount'] = daily_totals['Paid In'] + daily_totals['Withdrawn']
-
-    # Sort by date in descending order
-    daily_totals = daily_totals.sort_values('Date', ascending=False)
-
-    # Calculate grand totals
-    grand_totals = pd.DataFrame({
-        'Date': ['TOTAL'],
-        'Paid In': [daily_totals['Paid In'].sum()],
-        'Withdrawn': [daily_totals['Withdrawn'].sum()],
-        'Net Amount': [daily_totals['Net Amount'].sum()]
+    try:
+        backend = table_backend(request.values.get('backend') or PDF_BACKEND)
+    except ValueError as e:
+        return str(e), 400
+
+    # Nothing is written under a client-chosen name: the upload is read from the
+    # request's own buffer and the workbook goes to a spooled temp file that
+    # send_file streams back and closes (deleting it) when the response ends
+    transactions = extract_transactions(file.read(), backend)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        convert_to_excel(transactions, output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+
+    download_name = os.path.splitext(secure_filename(file.filename) or 'statement')[0] + '.xlsx'
+    return send_file(output, as_attachment=True, download_name=download_name,
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+def table_backend(backend='auto'):
+    """Check a backend name; 'auto' is kept and resolved per statement by choose_table_backend."""
+    if backend == 'auto':
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Choose from: auto, {', '.join(BACKENDS)}")
+    document_class = BACKENDS[backend][0]
+    if not (document_class.supports_tables or document_class.supports_words):
+        raise ValueError(f"PDF backend '{backend}' cannot extract tables")
+    return backend
+
+
+TRANSACTION_COLUMNS = ["Receipt No.", "Completion Time", "Details", "Transaction Status", "Paid In", "Withdrawn",
+                       "Balance"]
+AMOUNT_COLUMNS = ('Paid In', 'Withdrawn', 'Balance')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Statements are ruled tables: find cells from the drawn lines only
+TABLE_SETTINGS = {
+    'vertical_strategy': 'lines',
+    'horizontal_strategy': 'lines',
+    'snap_tolerance': 3,
+    'join_tolerance': 3,
+    'intersection_tolerance': 3,
+}
+
+# pdfplumber reads the ruled cells themselves. Text backends give positioned
+# words instead, which are split into cells at the header's column starts;
+# they are only used when they give pdfplumber's rows on the first pages.
+REFERENCE_TABLE_BACKEND = 'pdfplumber'
+TABLE_PROBE_PAGES = 3
+# Header labels are separated by gaps wider than this (points); the words of
+# one label by a space
+HEADER_GAP = 6
+# Points a cell's text may start left of its header label
+COLUMN_TOLERANCE = 3
+# Words whose baselines are closer than this (points) are on one line
+LINE_TOLERANCE = 3
+
+
+def _clean_cell(cell):
+    # Cell text wraps onto several lines; None is an empty cell
+    return ' '.join(cell.split()) if cell else ''
+
+
+def _is_header(cells):
+    return 'Receipt No.' in cells and 'Completion Time' in cells
+
+
+def _parse_amount(text):
+    try:
+        return float(text.replace(',', '')) if text else None
+    except ValueError:
+        return None
+
+
+def _typed_row(header, cells):
+    row = dict(zip(header, cells))
+    for column in AMOUNT_COLUMNS:
+        if column in row:
+            row[column] = _parse_amount(row[column])
+    if 'Completion Time' in row:
+        try:
+            row['Completion Time'] = datetime.strptime(row['Completion Time'], TIME_FORMAT)
+        except ValueError:
+            row['Completion Time'] = None
+    return row
+
+
+def _text_lines(words):
+    """Group (x0, x1, baseline, text) words into lines, top to bottom, each sorted left to right."""
+    lines = []
+    for x0, x1, baseline, text in sorted(words, key=lambda word: (-word[2], word[0])):
+        if lines and lines[-1][0] - baseline <= LINE_TOLERANCE:
+            lines[-1][1].append((x0, x1, text))
+        else:
+            lines.append((baseline, [(x0, x1, text)]))
+    return [sorted(line) for _, line in lines]
+
+
+def _gap_cells(line):
+    """(x0, text) of each run of words separated by gaps wider than HEADER_GAP."""
+    cells = []
+    previous_x1 = None
+    for x0, x1, text in line:
+        if cells and x0 - previous_x1 <= HEADER_GAP:
+            cells[-1] = (cells[-1][0], f'{cells[-1][1]} {text}')
+        else:
+            cells.append((x0, text))
+        previous_x1 = x1
+    return cells
+
+
+def _text_table(words, columns):
+    """Split a page's words (see pdf_backends.PdfiumDocument.page_words) into table rows.
+
+    Each line of text is a row; a cell wrapping onto further lines gives rows
+    without a receipt number, which iter_transactions merges as it does the
+    continuation rows of ruled tables. The header line is split at the gaps
+    between its labels and sets ``columns``, the left edge of each column,
+    which is carried over to later pages. Returns (rows, columns).
+    """
+    rows = []
+    for line in _text_lines(words or []):
+        gap_cells = _gap_cells(line)
+        if _is_header([text for _, text in gap_cells]):
+            columns = [x0 - COLUMN_TOLERANCE for x0, _ in gap_cells]
+        if columns is None:
+            # Before the header only its own line matters
+            rows.append([text for _, text in gap_cells])
+            continue
+        cells = [[] for _ in columns]
+        for x0, _, text in line:
+            cells[max(bisect_right(columns, x0) - 1, 0)].append(text)
+        rows.append([' '.join(cell) for cell in cells])
+    return rows, columns
+
+
+def _table_rows(document, pages):
+    """Yield the cleaned cells of each table row on ``pages``."""
+    columns = None
+    for page_num in pages:
+        if document.supports_tables:
+            rows = document.page_table(page_num, TABLE_SETTINGS) or []
+        else:
+            rows, columns = _text_table(document.page_words(page_num), columns)
+        for row in rows:
+            yield [_clean_cell(cell) for cell in row]
+
+
+def _transaction_cells(document, pages):
+    """Yield (header, cells) per transaction on ``pages``; see iter_transactions."""
+    header = None
+    pending = None
+    for cells in _table_rows(document, pages):
+        if not any(cells):
+            continue
+        if header is None:
+            if _is_header(cells):
+                header = cells
+                receipt = header.index('Receipt No.')
+            continue
+        if cells == header:
+            continue
+
+        if cells[receipt] or pending is None:
+            if pending is not None:
+                yield header, pending
+            pending = cells
+        else:
+            pending = [f'{old} {new}'.strip() for old, new in zip(pending, cells)]
+    if pending is not None:
+        yield header, pending
+
+
+def _probe_cells(document, pages):
+    return list(_transaction_cells(document, pages))
+
+
+def choose_table_backend(pdf_bytes):
+    """Pick the fastest installed backend whose first pages give exactly pdfplumber's rows.
+
+    pdfplumber reads the ruled cells the converter was written against; a
+    backend that splits text into cells is only used when the transactions
+    it reads from the probe pages are the same.
+    """
+    with open_pdf(pdf_bytes, REFERENCE_TABLE_BACKEND) as document:
+        # Probing would cost as much as reading a short statement outright
+        if document.page_count <= TABLE_PROBE_PAGES:
+            return REFERENCE_TABLE_BACKEND
+        reference = _probe_cells(document, range(TABLE_PROBE_PAGES))
+
+    # Nothing to compare against, so stay with the reference
+    if not reference:
+        return REFERENCE_TABLE_BACKEND
+
+    def accept(name, cells):
+        return cells == reference
+
+    return select_backend(pdf_bytes, accept, backends_faster_than(REFERENCE_TABLE_BACKEND, tables=True),
+                          TABLE_PROBE_PAGES, read=_probe_cells) or REFERENCE_TABLE_BACKEND
+
+
+def iter_transactions(pdf_bytes, backend='auto'):
+    """Yield one typed row (a dict keyed by column name) per transaction, page by page.
+
+    The header row is detected once and its repeats on later pages are
+    skipped, as are tables before it (the cover page summary). A row
+    without a receipt number continues the previous transaction and is merged
+    into it. Amounts are floats (None when blank) and Completion Time is a
+    datetime. With backend 'auto' the backend is picked by
+    choose_table_backend.
+    """
+    backend = table_backend(backend)
+    if backend == 'auto':
+        backend = choose_table_backend(pdf_bytes)
+    with open_pdf(pdf_bytes, backend) as pdf:
+        for header, cells in _transaction_cells(pdf, range(pdf.page_count)):
+            yield _typed_row(header, cells)
+
+
+def extract_transactions(pdf, backend='auto'):
+    """Typed transaction rows; ``pdf`` is the PDF's bytes or a file path."""
+    if isinstance(pdf, (bytes, bytearray)):
+        pdf_bytes = pdf
+    else:
+        with open(pdf, 'rb') as f:
+            pdf_bytes = f.read()
+    return list(iter_transactions(pdf_bytes, backend))
+
+
+# Rollup name -> (label column, pandas period frequency, label format)
+ROLLUPS = {
+    'daily': ('Date', 'D', '%Y-%m-%d'),
+    'weekly': ('Week', 'W-SUN', 'Week of %Y-%m-%d'),
+    'monthly': ('Month', 'M', '%B %Y'),
+}
+TOTAL_COLUMNS = ['Paid In', 'Withdrawn', 'Net Amount']
+AMOUNT_FORMAT = '#,##0.00'
+EXCEL_TIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _amounts(column):
+    if pd.api.types.is_numeric_dtype(column):
+        return column.fillna(0)
+    # Amounts are text like '1,234.50'; blanks and anything unparsable count as 0
+    return pd.to_numeric(column.str.replace(',', '', regex=False), errors='coerce').fillna(0)
+
+
+def _period_totals(totals, label, label_format):
+    totals = totals.sort_index(ascending=False)
+    totals['Net Amount'] = totals['Paid In'] + totals['Withdrawn']
+    totals.insert(0, label, totals.index.strftime(label_format))
+    totals = totals.reset_index(drop=True)
+
+    grand_totals = pd.DataFrame({label: ['TOTAL'], **{col: [totals[col].sum()] for col in TOTAL_COLUMNS}})
+    return pd.concat([totals, grand_totals], ignore_index=True)
+
+
+def calculate_totals(df, rollups=('daily', 'weekly', 'monthly')):
+    """Paid In, Withdrawn and Net Amount totals per period, newest first, for each rollup.
+
+    ``df`` holds typed rows (see iter_transactions) or the raw table text.
+    Rows are grouped by day once; weekly and monthly totals are summed from
+    the daily ones. Each frame ends with a TOTAL row. Amounts stay floats so
+    the Excel writer can apply number formats.
+    """
+    completion_time = df['Completion Time']
+    if pd.api.types.is_datetime64_any_dtype(completion_time):
+        dates = completion_time.dt.normalize()
+    else:
+        # Completion Time text normally starts with the date; only other rows pay for a regex search
+        dates = pd.to_datetime(completion_time.str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+        unmatched = dates.isna()
+        if unmatched.any():
+            found = completion_time[unmatched].str.extract(r'(\d{4}-\d{2}-\d{2})', expand=False)
+            dates[unmatched] = pd.to_datetime(found, format='%Y-%m-%d', errors='coerce')
+    # Rows without a date (headers and blank rows of raw text) are skipped
+    rows = dates.notna()
+
+    withdrawn = _amounts(df.loc[rows, 'Withdrawn'])
+    amounts = pd.DataFrame({
+        'Paid In': _amounts(df.loc[rows, 'Paid In']),
+        # Withdrawals are negative whether or not the statement prints the sign
+        'Withdrawn': withdrawn.where(withdrawn <= 0, -withdrawn),
     })
+    daily = amounts.groupby(dates[rows]).sum()
 
-    # Format numbers with commas for daily totals
-    daily_totals['Paid In'] = daily_totals['Paid In'].map('{:,.2f}'.format)
-    daily_totals['Withdrawn'] = daily_totals['Withdrawn'].map('{:,.2f}'.format)
-    daily_totals['Net Amount'] = daily_totals['Net Amount'].map('{:,.2f}'.format)
+    results = {}
+    for name in rollups:
+        label, freq, label_format = ROLLUPS[name]
+        if freq == 'D':
+            totals = daily.copy()
+        else:
+            totals = daily.groupby(daily.index.to_period(freq)).sum()
+            totals.index = totals.index.start_time
+        results[name] = _period_totals(totals, label, label_format)
+    return results
 
-    # Format numbers with commas for grand totals
-    grand_totals['Paid In'] = grand_totals['Paid In'].map('{:,.2f}'.format)
-    grand_totals['Withdrawn'] = grand_totals['Withdrawn'].map('{:,.2f}'.format)
-    grand_totals['Net Amount'] = grand_totals['Net Amount'].map('{:,.2f}'.format)
 
-    # Combine daily totals with grand totals
-    final_totals = pd.concat([daily_totals, grand_totals], ignore_index=True)
+def calculate_daily_totals(df):
+    return calculate_totals(df, rollups=('daily',))['daily']
 
-    return final_totals
 
+def _column_widths(frame):
+    """Display width of each column, header included, from one pass per column."""
+    widths = []
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            # Amounts are displayed as #,##0.00; the longest is one of the extremes
+            max_length = max((len(f'{value:,.2f}') for value in (values.min(), values.max())), default=0)
+        elif len(values):
+            max_length = values.fillna('').astype(str).str.len().max()
+        else:
+            max_length = 0
+        widths.append(max(len(str(column)), max_length) + 2)
+    return widths
 
-def convert_to_excel(data, filename):
-    # Define column names
-    column_names = ["Receipt No.", "Completion Time", "Details", "Transaction Status", "Paid In", "Withdrawn",
-                    "Balance"]
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data, columns=column_names[:len(data[0])])
+def _amount_columns(frame):
+    return [col_num for col_num, column in enumerate(frame.columns)
+            if pd.api.types.is_numeric_dtype(frame[column])]
 
-    # Calculate daily totals
-    daily_totals = calculate_daily_totals(df)
 
-    # Create Excel writer object
-    excel_path = os.path.join("uploads", filename.replace('.pdf', '.xlsx'))
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        # Write transactions to first sheet
-        df.to_excel(writer, sheet_name='Transactions', index=False)
+def _style_openpyxl(writer, sheets, totals_sheets):
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+    bold_font = Font(bold=True)
+    grey_fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
 
-        # Write daily totals to second sheet
-        daily_totals.to_excel(writer, sheet_name='Daily Totals', index=False)
+    for sheet_name, frame in sheets.items():
+        worksheet = writer.sheets[sheet_name]
+        for col_num, width in enumerate(_column_widths(frame), start=1):
+            worksheet.column_dimensions[get_column_letter(col_num)].width = width
 
-        # Get the workbook and the daily totals worksheet
-        workbook = writer.book
-        worksheet = writer.sheets['Daily Totals']
+        # Amounts are written as numbers and displayed with thousands separators
+        for col_num in _amount_columns(frame):
+            for row in worksheet.iter_rows(min_row=2, min_col=col_num + 1, max_col=col_num + 1):
+                row[0].number_format = AMOUNT_FORMAT
 
-        # Create a bold font style for the total row
-        from openpyxl.styles import Font, PatternFill
-        bold_font = Font(bold=True)
-        grey_fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+        if sheet_name not in totals_sheets:
+            continue
 
         # Apply bold font and grey background to the total row
         for cell in worksheet[worksheet.max_row]:
             cell.font = bold_font
             cell.fill = grey_fill
 
-        # Auto-adjust columns width in both sheets
-        for sheet_name in writer.sheets:
-            worksheet = writer.sheets[sheet_name]
-            for column in worksheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-
-    return excel_path
+
+def _write_xlsxwriter(output, sheets, totals_sheets):
+    # Rows go straight to xlsxwriter: pandas' to_excel costs more than the write itself,
+    # and constant_memory mode flushes each row instead of building the whole sheet
+    import xlsxwriter
+    # Statement text is data: never turn it into formulas or hyperlinks
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_formulas': False,
+                                            'strings_to_urls': False, 'default_date_format': EXCEL_TIME_FORMAT})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    amount_format = workbook.add_format({'num_format': AMOUNT_FORMAT})
+    total_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
+    total_amount_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'num_format': AMOUNT_FORMAT})
+
+    try:
+        for sheet_name, frame in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            is_totals = sheet_name in totals_sheets
+            amount_columns = _amount_columns(frame)
+            for col_num, width in enumerate(_column_widths(frame)):
+                worksheet.set_column(col_num, col_num, width, amount_format if col_num in amount_columns else None)
+
+            worksheet.write_row(0, 0, list(frame.columns), header_format)
+            body = frame.iloc[:-1] if is_totals else frame
+            # Missing cells are left blank, as to_excel does
+            body = body.astype(object).where(body.notna(), None)
+            for row_num, row in enumerate(body.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row_num, 0, row)
+
+            if is_totals:
+                # Apply bold font and grey background to the total row
+                for col_num, value in enumerate(frame.iloc[-1].tolist()):
+                    worksheet.write(len(frame), col_num, value,
+                                    total_amount_format if col_num in amount_columns else total_format)
+    finally:
+        workbook.close()
+
+
+def convert_to_excel(data, output, engine=None):
+    """Write the Transactions sheet and a sheet per totals rollup to ``output`` (a path or binary file).
+
+    ``data`` is the typed rows from extract_transactions.
+
+    ``engine`` is 'xlsxwriter' or 'openpyxl' (default: ``EXCEL_ENGINE``).
+    """
+    engine = engine or EXCEL_ENGINE
+    if engine not in ('xlsxwriter', 'openpyxl'):
+        raise ValueError(f"Unknown Excel engine '{engine}'. Choose from: xlsxwriter, openpyxl")
+
+    # Convert to DataFrame; the columns are the statement's own headers
+    df = pd.DataFrame(data) if data else pd.DataFrame(columns=TRANSACTION_COLUMNS)
+
+    # Calculate daily, weekly and monthly totals, one sheet each, e.g. 'Daily Totals'
+    totals = {f'{name.capitalize()} Totals': frame for name, frame in calculate_totals(df).items()}
+    sheets = {'Transactions': df, **totals}
+
+    # Column widths come from the DataFrames, so written cells are never re-scanned
+    if engine == 'xlsxwriter':
+        _write_xlsxwriter(output, sheets, totals)
+        return output
+
+    with pd.ExcelWriter(output, engine='openpyxl', datetime_format=EXCEL_TIME_FORMAT) as writer:
+        for sheet_name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+        _style_openpyxl(writer, sheets, totals)
+
+    return output
 
 
 if __name__ == '__main__':
@@ -1,11 +1,23 @@
-from flask import Flask, request, send_file, render_template_string
-import PyPDF2
-import pandas as pd
-import re
-from datetime import datetime
+from flask import Flask, Response, request, send_file, render_template_string, jsonify, url_for
+import atexit
 import io
+import os
+import shutil
+import tempfile
+import zipfile
 import logging
 import traceback
+from urllib.parse import quote
+
+from jobs import JobManager, JobQueueFull
+from result_cache import ResultCache, content_key
+from transaction_store import TransactionStore
+from pdf_backends import BACKENDS
+from metrics import CONVERSIONS_TOTAL
+import metrics
+from mpesync import (MAX_PDF_BYTES, STREAMING_MIN_TRANSACTIONS, SUMMARY_KEYS, StatementTooLarge, Transaction,
+                     append_to_report, build_workbook, process_pdf, process_statement_batch,
+                     write_workbook_streaming)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,179 +25,41 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Largest request body accepted, in bytes (0 disables the limit). Statements
+# are further limited by the MPESYNC_MAX_PDF_* budgets (see mpesync)
+MAX_UPLOAD_BYTES = int(os.environ.get('MPESYNC_MAX_UPLOAD_BYTES', str(256 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES or None
+
+# Cache of parsed transactions and finished workbooks, keyed by upload hash
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('MPESYNC_CACHE_MAX_ENTRIES', '64')),
+    max_bytes=int(os.environ.get('MPESYNC_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    ttl=int(os.environ.get('MPESYNC_CACHE_TTL', '3600')),
+    disk_dir=os.environ.get('MPESYNC_CACHE_DIR') or None,
+)
+
+# Workbooks of at least STREAMING_MIN_TRANSACTIONS transactions are streamed
+# to the client from disk in chunks of this size
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Parquet store of every processed statement's transactions (disabled when unset)
+STORE_DIR = os.environ.get('MPESYNC_STORE_DIR')
+transaction_store = TransactionStore(STORE_DIR) if STORE_DIR else None
+
+# Most statements one /batch request may hold
+BATCH_MAX_FILES = int(os.environ.get('MPESYNC_BATCH_MAX_FILES', '1000'))
+
+# Background conversion jobs: directory of their state and results (shared by
+# every worker), concurrent jobs and extra jobs allowed to wait per worker, and
+# seconds a finished job's result is kept
+job_manager = JobManager(
+    job_dir=os.environ.get('MPESYNC_JOB_DIR'),
+    max_workers=int(os.environ.get('MPESYNC_JOB_WORKERS', '2')),
+    max_queued=int(os.environ.get('MPESYNC_JOB_QUEUE_DEPTH', '8')),
+    ttl=int(os.environ.get('MPESYNC_JOB_TTL', '3600')),
+)
+atexit.register(job_manager.shutdown)
 
-def extract_transaction_details(text_content):
-    """Extract transaction details from M-PESA statement."""
-    transactions = []
-    current_transaction = {}
-
-    # Split into lines
-    lines = text_content.split('\n')
-    logger.info(f"Number of lines: {len(lines)}")
-
-    i = 0
-    while i < len(lines):
-        try:
-            line = lines[i].strip()
-
-            # Updated pattern to match transactions like "SAO4YDEXQY 2024-01-24"
-            if re.match(r'^[A-Z0-9]{9,10}\s+\d{4}-\d{2}-\d{2}', line):
-                # Save previous transaction if exists
-                if current_transaction:
-                    transactions.append(current_transaction)
-
-                # Start new transaction
-                parts = line.split()
-                current_transaction = {
-                    'Reference': parts[0],
-                    'Date': parts[1],
-                    'Time': None,  # Initialize Time as None
-                    'Amount': None,  # Initialize Amount as None
-                    'Name': None,  # Initialize Name as None
-                    'Account': None  # Initialize Account as None
-                }
-
-                # Get time from next line if it exists
-                time_line = line
-                if re.search(r'\d{2}:\d{2}:\d{2}', time_line):
-                    time_match = re.search(r'(\d{2}:\d{2}:\d{2})', time_line)
-                    if time_match:
-                        current_transaction['Time'] = time_match.group(1)
-
-                # Collect transaction details from subsequent lines until next transaction
-                details_lines = []
-                j = i + 1
-                while j < len(lines):
-                    next_line = lines[j].strip()
-                    if re.match(r'^[A-Z0-9]{9,10}\s+\d{4}-\d{2}-\d{2}', next_line):
-                        break
-                    if next_line:
-                        details_lines.append(next_line)
-                    j += 1
-
-                # Join collected lines
-                details_text = ' '.join(details_lines)
-
-                # Extract amount
-                amount_match = re.search(r'Completed\s+([\d,]+\.\d{2})', details_text)
-                if amount_match:
-                    amount_str = amount_match.group(1).replace(',', '')
-                    current_transaction['Amount'] = float(amount_str)
-
-                # Extract name and account
-                # Try various patterns that appear in your PDF
-                name_patterns = [
-                    r'from\s+254\*+\d+\s*-\s*([^-]+?)\s+Acc\.',  # Matches "from 254***** - NAME Acc."
-                    r'-\s*([^-]+?)\s+Acc\.',  # Matches "- NAME Acc."
-                ]
-
-                for pattern in name_patterns:
-                    name_match = re.search(pattern, details_text)
-                    if name_match:
-                        current_transaction['Name'] = name_match.group(1).strip()
-                        break
-
-                # Extract account number
-                acc_match = re.search(r'Acc\.\s*([^C]+?)(?=\s*Completed|$)', details_text)
-                if acc_match:
-                    current_transaction['Account'] = acc_match.group(1).strip()
-
-            i += 1
-
-        except Exception as e:
-            logger.error(f"Error processing line {i}: {str(e)}")
-            logger.error(traceback.format_exc())
-            i += 1
-            continue
-
-    # Add the last transaction
-    if current_transaction:
-        transactions.append(current_transaction)
-
-    logger.info(f"Extracted {len(transactions)} transactions")
-    return transactions
-
-
-def process_pdf(pdf_file):
-    """Process PDF and extract transactions."""
-    all_transactions = []
-
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        logger.info(f"PDF loaded successfully. Number of pages: {len(pdf_reader.pages)}")
-
-        for page_num in range(len(pdf_reader.pages)):
-            try:
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-                logger.info(f"\nProcessing page {page_num + 1}")
-                logger.info(f"Page text sample: {text[:200]}")
-
-                transactions = extract_transaction_details(text)
-                all_transactions.extend(transactions)
-
-                logger.info(f"Transactions found on page {page_num + 1}: {len(transactions)}")
-
-            except Exception as e:
-                logger.error(f"Error processing page {page_num + 1}: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
-
-    except Exception as e:
-        logger.error(f"Error reading PDF: {str(e)}")
-        raise
-
-    logger.info(f"Total transactions found across all pages: {len(all_transactions)}")
-    return all_transactions
-
-
-def create_monthly_summary(transactions):
-    """Create monthly summary DataFrame from transactions."""
-    if not transactions:
-        return pd.DataFrame()
-
-    # Convert transactions to DataFrame
-    df = pd.DataFrame(transactions)
-
-    # Ensure Date is datetime
-    df['Date'] = pd.to_datetime(df['Date'])
-
-    # Sort by date
-    df = df.sort_values('Date')
-
-    # Extract month and year
-    df['Month'] = df['Date'].dt.strftime('%B %Y')
-
-    # Create a temporary month key for sorting
-    df['Month_Sort'] = df['Date'].dt.strftime('%Y-%m')
-
-    # Create pivot table
-    pivot_df = df.pivot_table(
-        index=['Name', 'Account'],
-        columns='Month',
-        values='Amount',
-        aggfunc='sum',
-        fill_value=0
-    ).reset_index()
-
-    # Calculate total for sorting
-    pivot_df['Total'] = pivot_df.select_dtypes(include=['float64']).sum(axis=1)
-
-    # Sort first by Name alphabetically, then by Total amount descending
-    pivot_df = pivot_df.sort_values(['Name', 'Total'], ascending=[True, False])
-
-    # Sort the columns (keeping Name, Account, and Total in place)
-    static_cols = ['Name', 'Account']
-    month_cols = [col for col in pivot_df.columns if col not in static_cols + ['Total']]
-
-    # Convert month names to datetime for sorting
-    month_dates = pd.to_datetime([datetime.strptime(m, '%B %Y') for m in month_cols])
-    sorted_month_cols = [d.strftime('%B %Y') for d in sorted(month_dates)]
-
-    # Reorder columns with sorted months
-    pivot_df = pivot_df[static_cols + sorted_month_cols + ['Total']]
-
-    return pivot_df
 
 @app.route('/')
 def index():
@@ -273,6 +147,10 @@ def index():
                     <div class="file-input">
                         <input type="file" name="pdf_file" accept=".pdf" required>
                     </div>
+                    <div class="file-input">
+                        <label>Add to an existing MPESync workbook (optional):</label>
+                        <input type="file" name="existing_workbook" accept=".xlsx">
+                    </div>
                     <button type="submit" class="upload-btn">Process Statement</button>
                 </form>
                 <div class="features">
@@ -291,6 +169,94 @@ def index():
     '''
 
 
+def _stream_file(path, chunk_size):
+    """Yield a file in chunks and delete it once it has been sent."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def streaming_workbook_response(transactions, keys=SUMMARY_KEYS, download_name='mpesa_transactions.xlsx'):
+    """Write the report to a temporary file and stream it to the client in chunks."""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'w+b') as f:
+            write_workbook_streaming(transactions, f, keys)
+    except Exception:
+        os.remove(path)
+        raise
+
+    response = Response(
+        _stream_file(path, STREAM_CHUNK_SIZE),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers={
+            'Content-Disposition': f'attachment; filename={download_name}',
+            'Content-Length': str(os.path.getsize(path)),
+        },
+        direct_passthrough=True,
+    )
+    return response
+
+
+def _save_batch_uploads(files, directory, failures):
+    """Write uploaded PDFs (or the PDFs inside uploaded zips) to ``directory``.
+
+    Yields (source_name, path) pairs. Files are streamed to disk one at a time
+    so a large batch is never held in memory. Zip members over MAX_PDF_BYTES
+    are skipped and added to ``failures`` as (source_name, error message).
+    """
+    count = 0
+    for upload in files:
+        if upload.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith('.pdf'):
+                        continue
+                    count += 1
+                    if count > BATCH_MAX_FILES:
+                        raise ValueError(f'Batch exceeds {BATCH_MAX_FILES} statements')
+                    # Checked before unpacking, so a zip bomb is never written out
+                    if MAX_PDF_BYTES and member.file_size > MAX_PDF_BYTES:
+                        failures.append((member.filename, f'Statement is larger than {MAX_PDF_BYTES} bytes'))
+                        continue
+                    path = os.path.join(directory, f'{count}.pdf')
+                    with archive.open(member) as src, open(path, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    yield member.filename, path
+        else:
+            count += 1
+            if count > BATCH_MAX_FILES:
+                raise ValueError(f'Batch exceeds {BATCH_MAX_FILES} statements')
+            path = os.path.join(directory, f'{count}.pdf')
+            upload.save(path)
+            yield upload.filename, path
+
+
+def _failed_sources_header(failures):
+    """X-Failed-Sources value: the percent-encoded names of skipped statements, comma separated."""
+    return ','.join(quote(source_name, safe='') for source_name, _ in failures)
+
+
+def _requested_backend():
+    """PDF backend chosen by the request (form field or query parameter), if any."""
+    backend = request.values.get('backend')
+    if backend and backend != 'auto' and backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Choose from: auto, {', '.join(BACKENDS)}")
+    return backend
+
+
+def _statement_key(pdf_bytes, backend):
+    """Cache/store key of a statement; explicit backends are cached separately."""
+    key = content_key(pdf_bytes)
+    return f'{key}-{backend}' if backend else key
+
+
 @app.route('/process', methods=['POST'])
 def process():
     """Process the uploaded PDF file and return Excel file."""
@@ -302,131 +268,308 @@ def process():
         return 'No file selected', 400
 
     try:
-        transactions = process_pdf(pdf_file)
+        backend = _requested_backend()
+    except ValueError as e:
+        return str(e), 400
 
-        if not transactions:
-            return 'No transactions found. Please check the PDF format.', 400
-
-        # Create monthly summary
-        monthly_summary = create_monthly_summary(transactions)
-
-        # Create detailed transactions DataFrame
-        detailed_df = pd.DataFrame(transactions)
-
-        # Ensure all required columns exist with default values
-        for col in ['Date', 'Reference', 'Name', 'Account', 'Amount', 'Time']:
-            if col not in detailed_df.columns:
-                detailed_df[col] = None
-
-        # Convert Date to datetime
-        detailed_df['Date'] = pd.to_datetime(detailed_df['Date'])
-
-        # Sort by date
-        detailed_df = detailed_df.sort_values('Date')
-
-        # Reorder columns
-        detailed_df = detailed_df[['Date', 'Reference', 'Name', 'Account', 'Amount', 'Time']]
-
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            # Write monthly summary
-            monthly_summary.to_excel(writer, sheet_name='Monthly Summary', index=False)
-
-            # Write detailed transactions
-            detailed_df.to_excel(writer, sheet_name='Detailed Transactions', index=False)
-
-            workbook = writer.book
-
-            # Format Monthly Summary sheet
-            summary_worksheet = writer.sheets['Monthly Summary']
-
-            # Add formats
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#D3D3D3',
-                'border': 1,
-                'text_wrap': True,
-                'align': 'center',
-                'valign': 'vcenter'
-            })
-            money_format = workbook.add_format({
-                'num_format': '#,##0.00',
-                'border': 1,
-                'align': 'right'
-            })
-            text_format = workbook.add_format({
-                'border': 1,
-                'text_wrap': True
-            })
-            total_format = workbook.add_format({
-                'bold': True,
-                'num_format': '#,##0.00',
-                'bg_color': '#F0F0F0',
-                'border': 1,
-                'align': 'right'
-            })
-
-            # Apply formats to Monthly Summary
-            for col_num, value in enumerate(monthly_summary.columns.values):
-                summary_worksheet.write(0, col_num, value, header_format)
-
-                # Set column formats and widths
-                if col_num < 2:  # Name and Account columns
-                    summary_worksheet.set_column(col_num, col_num, 30, text_format)
-                else:  # Amount columns
-                    summary_worksheet.set_column(col_num, col_num, 15, money_format)
-
-            # Add totals row
-            total_row = len(monthly_summary) + 1
-            summary_worksheet.write(total_row, 0, 'TOTAL', total_format)
-            summary_worksheet.write(total_row, 1, '', total_format)
-
-            for col_num in range(2, len(monthly_summary.columns)):
-                col_letter = chr(65 + col_num)
-                formula = f'=SUM({col_letter}2:{col_letter}{total_row})'
-                summary_worksheet.write_formula(total_row, col_num, formula, total_format)
-
-            # Format Detailed Transactions sheet
-            detailed_worksheet = writer.sheets['Detailed Transactions']
-
-            # Set formats for detailed transactions
-            date_format = workbook.add_format({
-                'num_format': 'yyyy-mm-dd',
-                'border': 1,
-                'align': 'center'
-            })
-            time_format = workbook.add_format({
-                'num_format': 'hh:mm:ss',
-                'border': 1,
-                'align': 'center'
-            })
-
-            # Set column widths and formats
-            detailed_worksheet.set_column('A:A', 12, date_format)  # Date
-            detailed_worksheet.set_column('B:B', 15, text_format)  # Reference
-            detailed_worksheet.set_column('C:C', 30, text_format)  # Name
-            detailed_worksheet.set_column('D:D', 15, text_format)  # Account
-            detailed_worksheet.set_column('E:E', 15, money_format)  # Amount
-            detailed_worksheet.set_column('F:F', 10, time_format)  # Time
-
-            # Apply header format
-            for col_num, value in enumerate(detailed_df.columns.values):
-                detailed_worksheet.write(0, col_num, value, header_format)
-
-        output.seek(0)
-        return send_file(
-            output,
+    # A previously generated report to append this statement to
+    existing_workbook = request.files.get('existing_workbook')
+    if existing_workbook is not None and existing_workbook.filename == '':
+        existing_workbook = None
+
+    try:
+        pdf_bytes = pdf_file.read()
+        cache_key = _statement_key(pdf_bytes, backend)
+        cached = result_cache.get(cache_key)
+
+        if existing_workbook is not None:
+            return _append_response(existing_workbook, pdf_bytes, cached, cache_key, backend, pdf_file.filename)
+
+        if cached is not None:
+            logger.info(f"Serving cached result for {cache_key[:12]}")
+            workbook_bytes = cached['workbook']
+            cache_status = 'HIT'
+        else:
+            transactions = process_pdf(io.BytesIO(pdf_bytes), backend=backend)
+
+            if not transactions:
+                CONVERSIONS_TOTAL.inc(route='process', outcome='empty')
+                return 'No transactions found. Please check the PDF format.', 400
+
+            if transaction_store is not None:
+                transaction_store.write(transactions, cache_key)
+
+            # Large statements are streamed from disk instead of being built
+            # (and cached) in memory
+            if len(transactions) >= STREAMING_MIN_TRANSACTIONS or request.args.get('stream') == '1':
+                logger.info(f"Streaming workbook for {len(transactions)} transactions")
+                CONVERSIONS_TOTAL.inc(route='process', outcome='streamed')
+                return streaming_workbook_response(transactions)
+
+            workbook_bytes = build_workbook(transactions)
+            result_cache.put(cache_key, {'transactions': transactions, 'workbook': workbook_bytes})
+            cache_status = 'MISS'
+
+        response = send_file(
+            io.BytesIO(workbook_bytes),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name='mpesa_transactions.xlsx'
         )
+        response.headers['X-Cache'] = cache_status
+        CONVERSIONS_TOTAL.inc(route='process', outcome=f'cache_{cache_status.lower()}')
+        return response
 
+    except StatementTooLarge as e:
+        CONVERSIONS_TOTAL.inc(route='process', outcome='rejected')
+        return str(e), 413
     except Exception as e:
+        CONVERSIONS_TOTAL.inc(route='process', outcome='error')
         logger.error(f"Error in process route: {str(e)}")
         logger.error(traceback.format_exc())
         return f'Error processing file: {str(e)}', 500
 
 
+def _append_response(existing_workbook, pdf_bytes, cached, cache_key, backend, source):
+    """/process with an existing workbook: merge the statement into it and return the result."""
+    if cached is not None:
+        transactions = cached['transactions']
+    else:
+        transactions = process_pdf(io.BytesIO(pdf_bytes), backend=backend)
+        if transactions and transaction_store is not None:
+            transaction_store.write(transactions, cache_key)
+
+    if not transactions:
+        CONVERSIONS_TOTAL.inc(route='process', outcome='empty')
+        return 'No transactions found. Please check the PDF format.', 400
+
+    try:
+        workbook_bytes, added = append_to_report(existing_workbook, transactions, source=source)
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        CONVERSIONS_TOTAL.inc(route='process', outcome='error')
+        return f'Not an MPESync workbook: {str(e)}', 400
+    logger.info(f"Appended {added} of {len(transactions)} transactions to the existing workbook")
+
+    response = send_file(
+        io.BytesIO(workbook_bytes),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name='mpesa_transactions.xlsx'
+    )
+    response.headers['X-Appended-Transactions'] = str(added)
+    CONVERSIONS_TOTAL.inc(route='process', outcome='appended')
+    return response
+
+
+def _run_conversion_job(job, pdf_bytes, backend=None):
+    """Background job: convert a statement and return the path of the workbook file."""
+    fd, path = tempfile.mkstemp(prefix=f'mpesync-job-{job.id}-', suffix='.xlsx', dir=job_manager.job_dir)
+    try:
+        with os.fdopen(fd, 'w+b') as f:
+            cache_key = _statement_key(pdf_bytes, backend)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                f.write(cached['workbook'])
+                return path
+
+            transactions = process_pdf(io.BytesIO(pdf_bytes), progress=job.set_progress, backend=backend)
+            if not transactions:
+                raise ValueError('No transactions found. Please check the PDF format.')
+
+            if transaction_store is not None:
+                transaction_store.write(transactions, cache_key)
+
+            if len(transactions) >= STREAMING_MIN_TRANSACTIONS:
+                write_workbook_streaming(transactions, f)
+            else:
+                workbook_bytes = build_workbook(transactions)
+                result_cache.put(cache_key, {'transactions': transactions, 'workbook': workbook_bytes})
+                f.write(workbook_bytes)
+        return path
+
+    except StatementTooLarge:
+        os.remove(path)
+        job.error_status = 413
+        raise
+    except Exception:
+        os.remove(path)
+        raise
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a statement for conversion and return its job id immediately."""
+    if 'pdf_file' not in request.files:
+        return 'No file uploaded', 400
+
+    pdf_file = request.files['pdf_file']
+    if pdf_file.filename == '':
+        return 'No file selected', 400
+
+    try:
+        backend = _requested_backend()
+    except ValueError as e:
+        return str(e), 400
+
+    try:
+        job = job_manager.submit(_run_conversion_job, pdf_file.read(), backend)
+    except JobQueueFull:
+        CONVERSIONS_TOTAL.inc(route='jobs', outcome='rejected')
+        response = jsonify({'error': 'Too many conversions in progress, try again later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = '5'
+        return response
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('job_status', job_id=job.id)
+    return response
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the status and page progress of a conversion job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Download the workbook produced by a finished job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job.status == 'failed':
+        # Statements over the limits are rejected as /process rejects them
+        if job.error_status == 413:
+            return job.error, 413
+        return f'Error processing file: {job.error}', 500
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+
+    return send_file(
+        job.result_path,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name='mpesa_transactions.xlsx'
+    )
+
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Convert many statements (PDFs and/or zips of PDFs) into one consolidated workbook."""
+    files = [f for f in request.files.getlist('pdf_files') if f.filename]
+    if not files:
+        return 'No files uploaded', 400
+
+    try:
+        backend = _requested_backend()
+    except ValueError as e:
+        return str(e), 400
+
+    # Statements that could not be converted are skipped and reported
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='mpesync-batch-') as directory:
+            sources = list(_save_batch_uploads(files, directory, failures))
+            logger.info(f"Batch of {len(sources)} statements")
+            transactions = process_statement_batch(sources, backend=backend, failures=failures)
+
+        if not transactions:
+            CONVERSIONS_TOTAL.inc(route='batch', outcome='empty')
+            message = 'No transactions found. Please check the PDF format.'
+            if failures:
+                message += ' Failed statements:\n' + '\n'.join(f'{name}: {error}' for name, error in failures)
+            return message, 400, {'X-Failed-Sources': _failed_sources_header(failures)}
+
+        CONVERSIONS_TOTAL.inc(route='batch', outcome='partial' if failures else 'ok')
+        keys = SUMMARY_KEYS + ('Source',)
+        if len(transactions) >= STREAMING_MIN_TRANSACTIONS:
+            response = streaming_workbook_response(transactions, keys, 'mpesa_batch.xlsx')
+        else:
+            response = send_file(
+                io.BytesIO(build_workbook(transactions, keys)),
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                as_attachment=True,
+                download_name='mpesa_batch.xlsx'
+            )
+        if failures:
+            response.headers['X-Failed-Sources'] = _failed_sources_header(failures)
+        return response
+
+    except (ValueError, zipfile.BadZipFile) as e:
+        return f'Invalid batch: {str(e)}', 400
+    except Exception as e:
+        CONVERSIONS_TOTAL.inc(route='batch', outcome='error')
+        logger.error(f"Error in batch route: {str(e)}")
+        logger.error(traceback.format_exc())
+        return f'Error processing files: {str(e)}', 500
+
+
+@app.route('/transactions')
+def query_transactions():
+    """Query stored transactions without re-parsing statements.
+
+    Query parameters: ``start`` / ``end`` months (YYYY-MM, inclusive),
+    ``columns`` (comma separated) and ``format`` (json, csv or xlsx; xlsx
+    returns the usual report for the selected months).
+    """
+    if transaction_store is None:
+        return 'Transaction store is not configured (set MPESYNC_STORE_DIR)', 404
+
+    output_format = request.args.get('format', 'json')
+    columns = request.args.get('columns')
+    columns = [col.strip() for col in columns.split(',')] if columns and output_format != 'xlsx' else None
+
+    try:
+        df = transaction_store.query(request.args.get('start'), request.args.get('end'), columns)
+    except ValueError as e:
+        return f'Invalid query: {str(e)}', 400
+
+    if output_format == 'xlsx':
+        if df.empty:
+            return 'No transactions found for the selected months.', 404
+        df = df.astype(object).where(df.notna(), None)
+        transactions = [Transaction(row.Reference, row.Date, row.Time, row.AmountCents, row.Name, row.Account)
+                        for row in df.itertuples(index=False)]
+        return send_file(
+            io.BytesIO(build_workbook(transactions)),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='mpesa_transactions.xlsx'
+        )
+
+    if 'AmountCents' in df.columns:
+        df['Amount'] = df['AmountCents'] / 100
+        df = df.drop(columns='AmountCents')
+    if 'Date' in df.columns:
+        df['Date'] = df['Date'].astype(str)
+
+    if output_format == 'csv':
+        return Response(df.to_csv(index=False), mimetype='text/csv')
+    return Response(df.to_json(orient='records'), mimetype='application/json')
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Report result cache hit/miss counters."""
+    return jsonify(result_cache.stats())
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose pipeline metrics in the Prometheus text format."""
+    lines = [metrics.render()]
+
+    # Point-in-time gauges for the cache and job queue
+    for name, value in result_cache.stats().items():
+        lines.append(f'# TYPE mpesync_cache_{name} gauge\nmpesync_cache_{name} {value}\n')
+    lines.append(f'# TYPE mpesync_jobs_pending gauge\nmpesync_jobs_pending {job_manager.pending()}\n')
+
+    return Response(''.join(lines), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,50 @@
+"""Time append_to_report against rebuilding the report.
+
+Builds a report of ``n_old`` synthetic transactions, then merges ``n_new``
+more into it: from the state stored in the workbook, and from its sheets
+(the path taken for workbooks without state, e.g. re-saved in Excel).
+
+Usage: python benchmarks/bench_append.py [n_old] [n_new]
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mpesync  # noqa: E402
+from benchmarks.bench_summary import as_records  # noqa: E402
+from benchmarks.synthetic import generate_transactions  # noqa: E402
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<28} {time.perf_counter() - started:>8.2f}")
+    return result
+
+
+def main():
+    logging.disable(logging.INFO)
+    n_old = int(sys.argv[1]) if len(sys.argv) > 1 else 49_000
+    n_new = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    transactions = as_records(generate_transactions(n_old + n_new, n_names=500, n_accounts=1000, years=2))
+    old, new = transactions[:n_old], transactions[n_old:]
+
+    print(f"{n_old} transactions + {n_new} new")
+    print(f"{'step':<28} {'s':>8}")
+    report = timed(f'build_workbook {n_old}', mpesync.build_workbook, old)
+    timed(f'build_workbook {n_old + n_new}', mpesync.build_workbook, transactions)
+    timed('read_report_state', mpesync.read_report_state, io.BytesIO(report))
+    timed('read_report', mpesync.read_report, io.BytesIO(report))
+    timed('append_to_report (state)', mpesync.append_to_report, io.BytesIO(report), new)
+
+    mpesync.REPORT_STATE = False
+    report_without_state = mpesync.build_workbook(old)
+    timed('append_to_report (sheets)', mpesync.append_to_report, io.BytesIO(report_without_state), new)
+
+
+if __name__ == '__main__':
+    main()
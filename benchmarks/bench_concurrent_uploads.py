@@ -0,0 +1,102 @@
+"""Concurrent upload throughput of the table converter (Mpesa_pdf_to_excel/app.py).
+
+Serves the app from a threaded werkzeug server and posts distinct synthetic
+statements that all share the same filename, as concurrent clients would. Every
+response is checked against the statement that was uploaded, so requests that
+read or return each other's data are reported as mismatches.
+
+Usage: python benchmarks/bench_concurrent_uploads.py --clients 1 4 8 --requests 32
+"""
+import argparse
+import http.client
+import importlib.util
+import io
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_entries, generate_statement_pdf  # noqa: E402
+
+
+def _load_table_app():
+    spec = importlib.util.spec_from_file_location(
+        'mpesa_table_app', os.path.join(ROOT, 'Mpesa_pdf_to_excel', 'app.py'))
+    table_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(table_app)
+    return table_app.app
+
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def _upload(port, statement):
+    body, content_type = _multipart('file', 'statement.pdf', statement['pdf'])
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    try:
+        connection.request('POST', '/convert', body, {'Content-Type': content_type})
+        response = connection.getresponse()
+        payload = response.read()
+    finally:
+        connection.close()
+    elapsed = time.perf_counter() - started
+
+    if response.status != 200:
+        return elapsed, False
+    receipts = pd.read_excel(io.BytesIO(payload), sheet_name='Transactions')['Receipt No.']
+    return elapsed, list(receipts) == statement['references']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure table converter throughput under concurrent uploads.')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8], help='concurrent clients per run')
+    parser.add_argument('--requests', type=int, default=32, help='uploads per run')
+    parser.add_argument('--pages', type=int, default=5, help='transaction pages per statement')
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--statements', type=int, default=8, help='distinct statements to rotate through')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    statements = []
+    for seed in range(args.statements):
+        entries = generate_entries(args.pages * args.per_page, seed=seed)
+        statements.append({
+            'pdf': generate_statement_pdf(args.pages, args.per_page, 'table', seed=seed),
+            'references': [entry['reference'] for entry in entries],
+        })
+
+    server = make_server('127.0.0.1', 0, _load_table_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        print(f"{'clients':>7} {'requests':>8} {'req/s':>8} {'p50 s':>7} {'max s':>7} {'mismatches':>10}")
+        for clients in args.clients:
+            jobs = [statements[i % len(statements)] for i in range(args.requests)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                results = list(executor.map(lambda statement: _upload(server.port, statement), jobs))
+            wall = time.perf_counter() - started
+
+            latencies = sorted(elapsed for elapsed, _ in results)
+            mismatches = sum(1 for _, ok in results if not ok)
+            print(f"{clients:>7} {len(jobs):>8} {len(jobs) / wall:>8.2f} {latencies[len(latencies) // 2]:>7.3f} "
+                  f"{latencies[-1]:>7.3f} {mismatches:>10}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Before/after benchmark for the table converter's calculate_daily_totals.
+
+Usage: python benchmarks/bench_daily_totals.py [n_rows]
+"""
+import importlib.util
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import TABLE_COLUMNS, generate_table_rows  # noqa: E402
+
+
+def _load_table_app():
+    spec = importlib.util.spec_from_file_location(
+        'mpesa_table_app', os.path.join(ROOT, 'Mpesa_pdf_to_excel', 'app.py'))
+    table_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(table_app)
+    return table_app
+
+
+def legacy_calculate_daily_totals(df):
+    """The apply/map implementation this benchmark compares against."""
+    df_copy = df.copy()
+    df_copy = df_copy[df_copy['Completion Time'].str.contains(r'\d{4}-\d{2}-\d{2}', na=False)]
+    df_copy['Date'] = df_copy['Completion Time'].str.extract(r'(\d{4}-\d{2}-\d{2})')
+    df_copy['Paid In'] = df_copy['Paid In'].replace('', '0')
+    df_copy['Withdrawn'] = df_copy['Withdrawn'].replace('', '0')
+    df_copy['Paid In'] = pd.to_numeric(df_copy['Paid In'].str.replace(',', ''), errors='coerce').fillna(0)
+    df_copy['Withdrawn'] = pd.to_numeric(df_copy['Withdrawn'].str.replace(',', ''), errors='coerce').fillna(0)
+    df_copy['Withdrawn'] = df_copy['Withdrawn'].apply(lambda x: -x if x > 0 else x)
+    daily_totals = df_copy.groupby('Date').agg({'Paid In': 'sum', 'Withdrawn': 'sum'}).reset_index()
+    daily_totals['Net Amount'] = daily_totals['Paid In'] + daily_totals['Withdrawn']
+    daily_totals = daily_totals.sort_values('Date', ascending=False)
+    grand_totals = pd.DataFrame({
+        'Date': ['TOTAL'],
+        'Paid In': [daily_totals['Paid In'].sum()],
+        'Withdrawn': [daily_totals['Withdrawn'].sum()],
+        'Net Amount': [daily_totals['Net Amount'].sum()]
+    })
+    for col in ['Paid In', 'Withdrawn', 'Net Amount']:
+        daily_totals[col] = daily_totals[col].map('{:,.2f}'.format)
+        grand_totals[col] = grand_totals[col].map('{:,.2f}'.format)
+    return pd.concat([daily_totals, grand_totals], ignore_index=True)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    # Synthetic entries are about 3 hours apart, so 500k rows already span ~170 years
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    table_app = _load_table_app()
+    df = pd.DataFrame(generate_table_rows(n_rows), columns=TABLE_COLUMNS)
+
+    legacy_time, legacy_result = timed(legacy_calculate_daily_totals, df)
+    new_time, new_result = timed(table_app.calculate_daily_totals, df)
+    rollups_time, rollups = timed(table_app.calculate_totals, df)
+
+    # The new totals stay numeric; format them like the legacy strings to compare
+    formatted = new_result.copy()
+    for col in table_app.TOTAL_COLUMNS:
+        formatted[col] = formatted[col].map('{:,.2f}'.format)
+    pd.testing.assert_frame_equal(formatted, legacy_result.reset_index(drop=True))
+
+    print(f"{n_rows} rows, {len(new_result) - 1} days, {len(rollups['weekly']) - 1} weeks, "
+          f"{len(rollups['monthly']) - 1} months")
+    print(f"legacy apply/map:          {legacy_time:.2f}s")
+    print(f"vectorized daily:          {new_time:.2f}s ({legacy_time / new_time:.1f}x)")
+    print(f"daily + weekly + monthly:  {rollups_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
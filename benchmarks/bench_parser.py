@@ -0,0 +1,101 @@
+"""Before/after benchmark for extract_transaction_details.
+
+Usage: python benchmarks/bench_parser.py
+"""
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesync import extract_transaction_details  # noqa: E402
+from benchmarks.synthetic import generate_statement_text  # noqa: E402
+
+
+def legacy_extract_transaction_details(text_content):
+    """The look-ahead parser this benchmark compares against (logging removed)."""
+    transactions = []
+    current_transaction = {}
+    lines = text_content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if re.match(r'^[A-Z0-9]{9,10}\s+\d{4}-\d{2}-\d{2}', line):
+            if current_transaction:
+                transactions.append(current_transaction)
+            parts = line.split()
+            current_transaction = {
+                'Reference': parts[0],
+                'Date': parts[1],
+                'Time': None,
+                'Amount': None,
+                'Name': None,
+                'Account': None
+            }
+            if re.search(r'\d{2}:\d{2}:\d{2}', line):
+                time_match = re.search(r'(\d{2}:\d{2}:\d{2})', line)
+                if time_match:
+                    current_transaction['Time'] = time_match.group(1)
+            details_lines = []
+            j = i + 1
+            while j < len(lines):
+                next_line = lines[j].strip()
+                if re.match(r'^[A-Z0-9]{9,10}\s+\d{4}-\d{2}-\d{2}', next_line):
+                    break
+                if next_line:
+                    details_lines.append(next_line)
+                j += 1
+            details_text = ' '.join(details_lines)
+            amount_match = re.search(r'Completed\s+([\d,]+\.\d{2})', details_text)
+            if amount_match:
+                current_transaction['Amount'] = float(amount_match.group(1).replace(',', ''))
+            for pattern in [r'from\s+254\*+\d+\s*-\s*([^-]+?)\s+Acc\.', r'-\s*([^-]+?)\s+Acc\.']:
+                name_match = re.search(pattern, details_text)
+                if name_match:
+                    current_transaction['Name'] = name_match.group(1).strip()
+                    break
+            acc_match = re.search(r'Acc\.\s*([^C]+?)(?=\s*Completed|$)', details_text)
+            if acc_match:
+                current_transaction['Account'] = acc_match.group(1).strip()
+        i += 1
+    if current_transaction:
+        transactions.append(current_transaction)
+    return transactions
+
+
+def as_legacy_dict(transaction):
+    """A Transaction record in the dict layout the legacy parser returns."""
+    return {
+        'Reference': transaction.reference,
+        'Date': transaction.date.isoformat(),
+        'Time': transaction.time,
+        'Amount': transaction.amount,
+        'Name': transaction.name,
+        'Account': transaction.account,
+    }
+
+
+def best_of(func, text, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'lines':>8} {'legacy (s)':>12} {'single-pass (s)':>16} {'speedup':>8}")
+    for n_lines in (10_000, 100_000):
+        text = generate_statement_text(n_lines)
+        legacy_time, legacy_result = best_of(legacy_extract_transaction_details, text)
+        new_time, new_result = best_of(extract_transaction_details, text)
+        assert [as_legacy_dict(t) for t in new_result] == legacy_result, 'parsers disagree'
+        print(f"{n_lines:>8} {legacy_time:>12.3f} {new_time:>16.3f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
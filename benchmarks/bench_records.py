@@ -0,0 +1,73 @@
+"""Memory of parsed transactions: legacy per-row dicts vs Transaction records.
+
+Parses the same synthetic statement text with the legacy dict parser and
+with extract_transaction_details, then measures with tracemalloc:
+
+- the memory retained by the parsed transactions;
+- the peak while building the report DataFrames (the legacy path built one
+  for the summary and another for the detailed sheet, each parsing Date
+  strings; transactions_frame builds one from the already parsed records).
+
+Usage: python benchmarks/bench_records.py [n_transactions]
+"""
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesync import SUMMARY_KEYS, extract_transaction_details, transactions_frame  # noqa: E402
+from benchmarks.bench_parser import legacy_extract_transaction_details  # noqa: E402
+from benchmarks.synthetic import generate_transaction_lines  # noqa: E402
+
+
+def legacy_report_frames(transactions):
+    """The two DataFrames the dict-based build_workbook constructed."""
+    summary_df = pd.DataFrame(transactions, columns=list(SUMMARY_KEYS) + ['Date', 'Amount'])
+    summary_df['Month'] = pd.to_datetime(summary_df['Date']).dt.to_period('M')
+    detailed_df = pd.DataFrame(transactions)
+    detailed_df['Date'] = pd.to_datetime(detailed_df['Date'])
+    return summary_df, detailed_df
+
+
+def measure(parse, build_frames, text):
+    """Return (retained MiB, report frames peak MiB, parse seconds) for one representation."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    transactions = parse(text)
+    parse_seconds = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.reset_peak()
+    frames = build_frames(transactions)
+    frames_peak = tracemalloc.get_traced_memory()[1] - retained
+    tracemalloc.stop()
+
+    del frames, transactions
+    return retained / 2 ** 20, frames_peak / 2 ** 20, parse_seconds
+
+
+def main():
+    logging.disable(logging.INFO)
+    n_transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    text = '\n'.join(generate_transaction_lines(n_transactions, n_names=5000))
+
+    results = [
+        ('dicts', *measure(legacy_extract_transaction_details, legacy_report_frames, text)),
+        ('Transaction', *measure(extract_transaction_details, transactions_frame, text)),
+    ]
+
+    print(f"{n_transactions} transactions")
+    print(f"{'records':<12} {'retained MiB':>13} {'frames peak MiB':>16} {'parse s (traced)':>17}")
+    for name, retained, frames_peak, parse_seconds in results:
+        print(f"{name:<12} {retained:>13.1f} {frames_peak:>16.1f} {parse_seconds:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Before/after benchmark for create_monthly_summary.
+
+Usage: python benchmarks/bench_summary.py [n_transactions]
+"""
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesync import Transaction, create_monthly_summary  # noqa: E402
+from benchmarks.synthetic import generate_transactions  # noqa: E402
+
+
+def legacy_create_monthly_summary(transactions):
+    """The pivot_table/strptime implementation this benchmark compares against."""
+    if not transactions:
+        return pd.DataFrame()
+    df = pd.DataFrame(transactions)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values('Date')
+    df['Month'] = df['Date'].dt.strftime('%B %Y')
+    df['Month_Sort'] = df['Date'].dt.strftime('%Y-%m')
+    pivot_df = df.pivot_table(
+        index=['Name', 'Account'],
+        columns='Month',
+        values='Amount',
+        aggfunc='sum',
+        fill_value=0
+    ).reset_index()
+    pivot_df['Total'] = pivot_df.select_dtypes(include=['float64']).sum(axis=1)
+    pivot_df = pivot_df.sort_values(['Name', 'Total'], ascending=[True, False])
+    static_cols = ['Name', 'Account']
+    month_cols = [col for col in pivot_df.columns if col not in static_cols + ['Total']]
+    month_dates = pd.to_datetime([datetime.strptime(m, '%B %Y') for m in month_cols])
+    sorted_month_cols = [d.strftime('%B %Y') for d in sorted(month_dates)]
+    return pivot_df[static_cols + sorted_month_cols + ['Total']]
+
+
+def as_records(transactions):
+    """Transaction records equivalent to the legacy dicts."""
+    return [Transaction(t['Reference'], date.fromisoformat(t['Date']), t['Time'], round(t['Amount'] * 100),
+                        t['Name'], t['Account']) for t in transactions]
+
+
+def timed(func, transactions):
+    started = time.perf_counter()
+    result = func(transactions)
+    return time.perf_counter() - started, result
+
+
+def main():
+    logging.disable(logging.INFO)
+    n_transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    transactions = generate_transactions(n_transactions)
+
+    legacy_time, legacy_result = timed(legacy_create_monthly_summary, transactions)
+    new_time, new_result = timed(create_monthly_summary, as_records(transactions))
+
+    pd.testing.assert_frame_equal(
+        new_result.reset_index(drop=True), legacy_result.reset_index(drop=True),
+        check_names=False, check_dtype=False, check_index_type=False, check_column_type=False)
+
+    print(f"{n_transactions} transactions, {len(new_result)} summary rows, "
+          f"{len(new_result.columns) - 3} months")
+    print(f"legacy pivot_table: {legacy_time:.2f}s")
+    print(f"period groupby:     {new_time:.2f}s ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Time the workbook writers on multi-year (wide) summaries.
+
+Builds reports spanning ``years`` of synthetic transactions (10 years is 120
+month columns, well past column Z) with both workbook writers and both
+MPESYNC_SUMMARY_TOTALS modes. The TOTAL row itself is checked by
+tests/test_summary_totals.py.
+
+Usage: python benchmarks/bench_wide_summary.py [n_transactions] [years]
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mpesync  # noqa: E402
+from benchmarks.bench_summary import as_records  # noqa: E402
+from benchmarks.synthetic import generate_transactions  # noqa: E402
+
+
+def build(writer, transactions):
+    if writer == 'pandas':
+        return mpesync.build_workbook(transactions)
+    output = io.BytesIO()
+    mpesync.write_workbook_streaming(transactions, output)
+    return output.getvalue()
+
+
+def main():
+    logging.disable(logging.INFO)
+    n_transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    transactions = as_records(generate_transactions(n_transactions, n_names=50, n_accounts=100, years=years))
+
+    print(f"{n_transactions} transactions over {years} years")
+    print(f"{'writer':<10} {'totals':<8} {'MiB':>6} {'write s':>8}")
+    for writer in ('pandas', 'streaming'):
+        for mode in ('formula', 'value'):
+            mpesync.SUMMARY_TOTALS = mode
+            started = time.perf_counter()
+            workbook_bytes = build(writer, transactions)
+            elapsed = time.perf_counter() - started
+            print(f"{writer:<10} {mode:<8} {len(workbook_bytes) / 2 ** 20:>6.1f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Load test for /process (app.py) and /convert (Mpesa_pdf_to_excel/app.py).
+
+Posts synthetic statements from concurrent clients and reports requests/sec
+and p50/p95/p99 latency per endpoint. Every upload is a different statement,
+so /process answers from its result cache only if a statement repeats.
+
+By default both apps are served in-process by threaded werkzeug servers. To
+load a real deployment, start it and pass its base URL:
+
+    gunicorn -c gunicorn.conf.py wsgi:app --bind 127.0.0.1:8000
+    gunicorn -c gunicorn.conf.py wsgi:table_app --bind 127.0.0.1:8001
+    python benchmarks/load_test.py --process-url http://127.0.0.1:8000 --convert-url http://127.0.0.1:8001
+
+Usage: python benchmarks/load_test.py --clients 1 4 8 --requests 48 --pages 5
+"""
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_concurrent_uploads import _multipart  # noqa: E402
+from benchmarks.synthetic import generate_statement_pdf  # noqa: E402
+
+# Endpoint -> (upload field, statement layout)
+ENDPOINTS = {
+    'process': ('pdf_file', 'text'),
+    'convert': ('file', 'table'),
+}
+
+
+def _serve_in_process(endpoint):
+    """Start a threaded werkzeug server for the endpoint's app; returns (base URL, server)."""
+    import wsgi
+
+    server = make_server('127.0.0.1', 0, wsgi.app if endpoint == 'process' else wsgi.table_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.port}', server
+
+
+def _post(base_url, endpoint, field, pdf):
+    """Upload one statement; returns (seconds, HTTP status)."""
+    url = urlsplit(base_url)
+    body, content_type = _multipart(field, 'statement.pdf', pdf)
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=600)
+    try:
+        connection.request('POST', f'{url.path.rstrip("/")}/{endpoint}', body, {'Content-Type': content_type})
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    return time.perf_counter() - started, response.status
+
+
+def _percentiles(latencies):
+    """(p50, p95, p99) of a list of latencies."""
+    if len(latencies) < 2:
+        return latencies * 3
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def run(base_url, endpoint, clients, statements):
+    field, _ = ENDPOINTS[endpoint]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(lambda pdf: _post(base_url, endpoint, field, pdf), statements))
+    wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, status in results if status == 200]
+    errors = len(results) - len(latencies)
+    return len(results) / wall, _percentiles(latencies) if latencies else (float('nan'),) * 3, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the /process and /convert endpoints.')
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8], help='concurrent clients per run')
+    parser.add_argument('--requests', type=int, default=48, help='uploads per run')
+    parser.add_argument('--pages', type=int, default=5, help='transaction pages per statement')
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--process-url', help='base URL of a running app.py server (default: in-process)')
+    parser.add_argument('--convert-url', help='base URL of a running table converter (default: in-process)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'endpoint':<9} {'clients':>7} {'requests':>8} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'errors':>6}")
+    for endpoint in args.endpoints:
+        _, layout = ENDPOINTS[endpoint]
+        base_url = args.process_url if endpoint == 'process' else args.convert_url
+        server = None
+        if not base_url:
+            base_url, server = _serve_in_process(endpoint)
+        try:
+            seed = 0
+            for clients in args.clients:
+                # A fresh statement per upload keeps the result cache out of the measurement
+                statements = [generate_statement_pdf(args.pages, args.per_page, layout, seed=seed + i)
+                              for i in range(args.requests)]
+                seed += args.requests
+                rate, (p50, p95, p99), errors = run(base_url, endpoint, clients, statements)
+                print(f"{endpoint:<9} {clients:>7} {args.requests:>8} {rate:>8.2f} {p50:>7.3f} {p95:>7.3f} "
+                      f"{p99:>7.3f} {errors:>6}")
+        finally:
+            if server is not None:
+                server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
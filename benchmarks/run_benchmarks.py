@@ -0,0 +1,192 @@
+"""Benchmark harness for both converters.
+
+Generates synthetic statements (see synthetic.py) and measures, per size:
+
+- app.py (mpesync.py): process_pdf, extract_transaction_details on raw text,
+  create_monthly_summary and build_workbook (Excel formatting)
+- Mpesa_pdf_to_excel/app.py: extract_transactions, calculate_daily_totals
+  and convert_to_excel
+
+Every case runs in a fresh interpreter so peak RSS is per case. Results are
+written as JSON (with the git commit) so runs can be compared across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py --pages 10 50 --output results.json
+    python benchmarks/run_benchmarks.py --pages 10 50 --compare baseline.json
+"""
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_statement_pdf, generate_transaction_lines  # noqa: E402
+
+
+def _timed(stages, name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    stages[name] = time.perf_counter() - started
+    return result
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _bench_text_app(pdf_path, case):
+    import mpesync
+
+    stages = {}
+    transactions = _timed(stages, 'process_pdf', mpesync.process_pdf, pdf_path)
+    text = '\n'.join(generate_transaction_lines(case['pages'] * case['per_page'], seed=case['seed'],
+                                                n_names=case['names']))
+    _timed(stages, 'extract_transaction_details', mpesync.extract_transaction_details, text)
+    _timed(stages, 'create_monthly_summary', mpesync.create_monthly_summary, transactions)
+    _timed(stages, 'build_workbook', mpesync.build_workbook, transactions)
+    return stages, len(transactions), stages['process_pdf']
+
+
+def _bench_table_app(pdf_path, case):
+    spec = importlib.util.spec_from_file_location(
+        'mpesa_table_app', os.path.join(ROOT, 'Mpesa_pdf_to_excel', 'app.py'))
+    table_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(table_app)
+
+    stages = {}
+    rows = _timed(stages, 'extract_transactions', table_app.extract_transactions, pdf_path)
+    df = table_app.pd.DataFrame(rows)
+    _timed(stages, 'calculate_daily_totals', table_app.calculate_daily_totals, df)
+    _timed(stages, 'convert_to_excel', table_app.convert_to_excel, rows, io.BytesIO())
+    return stages, len(rows), stages['extract_transactions']
+
+
+def run_case(case):
+    """Run one benchmark case; called in a fresh interpreter."""
+    logging.disable(logging.CRITICAL)
+    workdir = tempfile.mkdtemp(prefix='mpesync-bench-')
+
+    pdf_path = os.path.join(workdir, 'statement.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(generate_statement_pdf(case['pages'], case['per_page'], case['layout'], case['names'],
+                                       case['multiline'], case['seed']))
+
+    bench = _bench_text_app if case['app'] == 'app.py' else _bench_table_app
+    stages, n_transactions, extract_seconds = bench(pdf_path, case)
+
+    # Cover and disclaimer pages are part of the document too
+    total_pages = case['pages'] + 2
+    return dict(
+        case,
+        transactions=n_transactions,
+        stages=stages,
+        pages_per_sec=total_pages / extract_seconds,
+        transactions_per_sec=n_transactions / sum(stages.values()),
+        peak_rss_mib=_peak_rss_mib(),
+    )
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _best(runs):
+    """Combine repeated runs: minimum time per stage, maximum peak RSS."""
+    best = dict(runs[0])
+    best['stages'] = {stage: min(run['stages'][stage] for run in runs) for stage in runs[0]['stages']}
+    best['pages_per_sec'] = max(run['pages_per_sec'] for run in runs)
+    best['transactions_per_sec'] = max(run['transactions_per_sec'] for run in runs)
+    best['peak_rss_mib'] = max(run['peak_rss_mib'] for run in runs)
+    return best
+
+
+def _case_key(case):
+    return case['app'], case['pages'], case['per_page'], case['names'], case['multiline']
+
+
+def print_results(results, baseline=None):
+    baseline_cases = {_case_key(case): case for case in (baseline or {}).get('cases', [])}
+    print(f"{'app':<28} {'pages':>6} {'txns':>7} {'pages/s':>9} {'txns/s':>9} {'RSS MiB':>8}  stages (s)")
+    for case in results['cases']:
+        app_name = 'app.py' if case['app'] == 'app.py' else 'Mpesa_pdf_to_excel/app.py'
+        stages = ', '.join(f"{name}={seconds:.3f}" for name, seconds in case['stages'].items())
+        print(f"{app_name:<28} {case['pages']:>6} {case['transactions']:>7} {case['pages_per_sec']:>9.1f} "
+              f"{case['transactions_per_sec']:>9.0f} {case['peak_rss_mib']:>8.1f}  {stages}")
+
+        old = baseline_cases.get(_case_key(case))
+        if old:
+            changes = ', '.join(f"{name} {old['stages'][name] / seconds:.2f}x"
+                                for name, seconds in case['stages'].items() if name in old['stages'])
+            print(f"{'':<28} vs {baseline.get('commit')}: {changes} (>1 is faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark both M-PESA converters on synthetic statements.')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 50, 200], help='transaction pages per case')
+    parser.add_argument('--per-page', type=int, default=20, help='transactions per page')
+    parser.add_argument('--names', type=int, default=100, help='distinct counterparty names')
+    parser.add_argument('--single-line-details', action='store_true')
+    parser.add_argument('--apps', nargs='+', choices=['app.py', 'table'], default=['app.py', 'table'])
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the best is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    cases = [{
+        'app': app_name,
+        'layout': 'text' if app_name == 'app.py' else 'table',
+        'pages': pages,
+        'per_page': args.per_page,
+        'names': args.names,
+        'multiline': not args.single_line_details,
+        'seed': args.seed,
+    } for app_name in args.apps for pages in args.pages]
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': [],
+    }
+    spawn = multiprocessing.get_context('spawn')
+    for case in cases:
+        runs = []
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                runs.append(executor.submit(run_case, case).result())
+        results['cases'].append(_best(runs))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
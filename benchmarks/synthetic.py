@@ -0,0 +1,299 @@
+"""Synthetic M-PESA statement data for benchmarks.
+
+Generates raw statement text, parsed-transaction dicts and complete PDF
+statements in the two layouts the apps read:
+
+- ``text``: the line-oriented layout parsed by ``app.py`` (PyPDF2 text)
+- ``organization``: the one-row-per-entry till/paybill layout, also parsed
+  by ``app.py``, with completion and initiation times and separate Paid In
+  and Withdrawn columns
+- ``table``: the ruled table layout read by ``Mpesa_pdf_to_excel/app.py``
+  (pdfplumber ``extract_table``)
+
+The PDFs are written directly (Helvetica text and line drawing operators),
+so no PDF library is needed. Everything is seeded and reproducible.
+
+Usage: python benchmarks/synthetic.py --pages 50 --per-page 20 --layout text -o statement.pdf
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+FIRST_NAMES = ['JOHN', 'MARY', 'PETER', 'GRACE', 'JAMES', 'FAITH', 'DAVID', 'MERCY', 'SAMUEL', 'ANN']
+LAST_NAMES = ['KAMAU', 'WANJIKU', 'OTIENO', 'ACHIENG', 'MWANGI', 'NJERI', 'KIPLAGAT', 'CHEBET', 'OMONDI', 'WAMBUI']
+REFERENCE_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+TABLE_COLUMNS = ["Receipt No.", "Completion Time", "Details", "Transaction Status", "Paid In", "Withdrawn",
+                 "Balance"]
+
+DISCLAIMER_LINES = [
+    'Disclaimer: This record is produced for your personal use. Safaricom shall not be liable',
+    'for any loss arising from reliance on this statement by any third party.',
+    'For any queries, please call 100 or 200 or visit any Safaricom shop.',
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+
+def _reference(rng):
+    return 'S' + ''.join(rng.choice(REFERENCE_CHARS) for _ in range(9))
+
+
+def _names(rng, n_names):
+    if n_names <= len(FIRST_NAMES) * len(LAST_NAMES):
+        return [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES][:n_names]
+    return [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(n_names)]
+
+
+def generate_entries(n_transactions, seed=0, start=datetime(2024, 1, 1), n_names=100):
+    """Yield dicts describing ``n_transactions`` statement entries in time order."""
+    rng = random.Random(seed)
+    names = _names(rng, n_names)
+    when = start
+    balance = rng.randint(1000, 500000)
+    for _ in range(n_transactions):
+        when += timedelta(seconds=rng.randint(60, 6 * 3600))
+        amount = rng.randint(10, 250000) + rng.choice([0, 0.5, 0.25])
+        paid_in = rng.random() < 0.7
+        balance += amount if paid_in else -amount
+        yield {
+            'reference': _reference(rng),
+            'when': when,
+            'name': rng.choice(names),
+            'phone_suffix': rng.randint(100, 999),
+            'account': str(rng.randint(1000, 99999)),
+            'amount': amount,
+            'paid_in': paid_in,
+            'balance': balance,
+        }
+
+
+def entry_text_lines(entry, multiline_details=True):
+    """Text lines of one entry in the layout parsed by app.py."""
+    lines = [f"{entry['reference']} {entry['when']:%Y-%m-%d %H:%M:%S} Pay Bill Online"]
+    details = f"Funds received from 254{'*' * 6}{entry['phone_suffix']} - {entry['name']} Acc."
+    if multiline_details:
+        lines.extend([details, entry['account']])
+    else:
+        lines.append(f"{details} {entry['account']}")
+    lines.append(f"Completed {entry['amount']:,.2f} {entry['balance']:,.2f}")
+    return lines
+
+
+def organization_entry_line(entry):
+    """Text line of one entry in the till/paybill (organization) layout."""
+    initiated = entry['when'] - timedelta(seconds=2)
+    phone = f"254{'*' * 6}{entry['phone_suffix']}"
+    if entry['paid_in']:
+        details = f"Pay Bill from {phone} - {entry['name']} Acc. {entry['account']}"
+        paid_in, withdrawn = f"{entry['amount']:,.2f}", '0.00'
+    else:
+        details = f"Business Payment to {phone} - {entry['name']}"
+        paid_in, withdrawn = '0.00', f"-{entry['amount']:,.2f}"
+    return (f"{entry['reference']} {entry['when']:%Y-%m-%d %H:%M:%S} {initiated:%Y-%m-%d %H:%M:%S} {details} "
+            f"Completed {paid_in} {withdrawn} {entry['balance']:,.2f}")
+
+
+def generate_transaction_lines(n_transactions, seed=0, start=datetime(2024, 1, 1), n_names=100,
+                               multiline_details=True):
+    """Yield the text lines of ``n_transactions`` statement entries (about 4 lines each)."""
+    for entry in generate_entries(n_transactions, seed=seed, start=start, n_names=n_names):
+        yield from entry_text_lines(entry, multiline_details)
+
+
+def generate_statement_text(n_lines, seed=0):
+    """Return statement text with roughly ``n_lines`` lines."""
+    return '\n'.join(generate_transaction_lines(max(1, n_lines // 4), seed=seed))
+
+
+def generate_transactions(n_transactions, seed=0, n_names=5000, n_accounts=20000, years=5,
+                          start=datetime(2020, 1, 1)):
+    """Return transaction dicts in the column layout of the report (Reference, Date, Amount, ...)."""
+    rng = random.Random(seed)
+    names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(n_names)]
+    accounts = [str(rng.randint(1000, 9999999)) for _ in range(n_accounts)]
+    span = years * 365 * 24 * 3600
+    transactions = []
+    for _ in range(n_transactions):
+        when = start + timedelta(seconds=rng.randrange(span))
+        transactions.append({
+            'Reference': _reference(rng),
+            'Date': f"{when:%Y-%m-%d}",
+            'Time': f"{when:%H:%M:%S}",
+            'Amount': rng.randint(10, 250000) + rng.choice([0, 0.5, 0.25]),
+            'Name': rng.choice(names),
+            'Account': rng.choice(accounts),
+        })
+    return transactions
+
+
+# PDF writing
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _text_at(x, y, text, size=8):
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET"
+
+
+def build_pdf(page_streams):
+    """Assemble a PDF from one content stream (str) per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for stream in page_streams:
+        data = stream.encode('latin-1')
+        content_id = len(objects) + 2
+        page_ids.append(len(objects) + 1)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _cover_page(entries, layout='text'):
+    first, last = entries[0]['when'], entries[-1]['when']
+    if layout == 'organization':
+        holder = ['Organization Name: SYNTHETIC TRADERS LTD', 'Short Code: 888880']
+    else:
+        holder = ['Customer Name: SYNTHETIC CUSTOMER', 'Mobile Number: 0722000000']
+    lines = [
+        'M-PESA STATEMENT',
+        *holder,
+        f"Statement Period: {first:%d %b %Y} - {last:%d %b %Y}",
+        'SUMMARY',
+        'TRANSACTION TYPE PAID IN PAID OUT',
+        'Pay Bill Online 0.00 0.00',
+    ]
+    return ' '.join(_text_at(40, 800 - 14 * i, line, 10) for i, line in enumerate(lines))
+
+
+def _disclaimer_page():
+    return ' '.join(_text_at(40, 800 - 14 * i, line) for i, line in enumerate(DISCLAIMER_LINES))
+
+
+def _text_page(entries, multiline_details):
+    lines = [line for entry in entries for line in entry_text_lines(entry, multiline_details)]
+    return ' '.join(_text_at(30, 810 - 10 * i, line) for i, line in enumerate(lines))
+
+
+# Column x positions of the table layout (left edges plus the right border)
+TABLE_X = [20, 82, 160, 370, 430, 478, 526, 578]
+
+
+def _table_cells(entry):
+    # Details is a (first line, second line) pair
+    return [
+        entry['reference'],
+        f"{entry['when']:%Y-%m-%d %H:%M:%S}",
+        (f"Pay Bill Online to {entry['account']}", f"- {entry['name']}"),
+        'Completed',
+        f"{entry['amount']:,.2f}" if entry['paid_in'] else '',
+        f"-{entry['amount']:,.2f}" if not entry['paid_in'] else '',
+        f"{entry['balance']:,.2f}",
+    ]
+
+
+def generate_table_rows(n_transactions, seed=0, n_names=100):
+    """Return table rows as extracted by Mpesa_pdf_to_excel/app.py (without header rows)."""
+    rows = []
+    for entry in generate_entries(n_transactions, seed=seed, n_names=n_names):
+        cells = _table_cells(entry)
+        cells[2] = '\n'.join(cells[2])
+        rows.append(cells)
+    return rows
+
+
+def _organization_page(entries, multiline_details):
+    # One row per entry; small type so the long rows fit the page width
+    lines = [organization_entry_line(entry) for entry in entries]
+    return ' '.join(_text_at(10, 810 - 9 * i, line, 5) for i, line in enumerate(lines))
+
+
+def _table_page(entries, multiline_details):
+    row_height = 22 if multiline_details else 12
+    top = 810
+    rows = [TABLE_COLUMNS] + [_table_cells(entry) for entry in entries]
+
+    ops = []
+    for row_num, row in enumerate(rows):
+        y = top - row_num * row_height
+        for col_num, cell in enumerate(row):
+            x = TABLE_X[col_num] + 2
+            if isinstance(cell, tuple):
+                if multiline_details:
+                    ops.append(_text_at(x, y - 9, cell[0], 6))
+                    ops.append(_text_at(x, y - 18, cell[1], 6))
+                else:
+                    ops.append(_text_at(x, y - 9, ' '.join(cell), 6))
+            elif cell:
+                ops.append(_text_at(x, y - 9, cell, 6))
+
+    # Ruling lines so pdfplumber's lines strategy finds the cells
+    bottom = top - len(rows) * row_height
+    ops.append("0.5 w")
+    for row_num in range(len(rows) + 1):
+        y = top - row_num * row_height
+        ops.append(f"{TABLE_X[0]} {y} m {TABLE_X[-1]} {y} l S")
+    for x in TABLE_X:
+        ops.append(f"{x} {top} m {x} {bottom} l S")
+    return ' '.join(ops)
+
+
+def generate_statement_pdf(pages=10, per_page=20, layout='text', n_names=100, multiline_details=True,
+                           seed=0, cover_page=True, disclaimer_page=True):
+    """Return the bytes of a synthetic statement with ``pages`` transaction pages."""
+    entries = list(generate_entries(pages * per_page, seed=seed, n_names=n_names))
+    render_page = {'text': _text_page, 'organization': _organization_page, 'table': _table_page}[layout]
+    streams = [render_page(entries[i:i + per_page], multiline_details) for i in range(0, len(entries), per_page)]
+    if cover_page:
+        streams.insert(0, _cover_page(entries, layout))
+    if disclaimer_page:
+        streams.append(_disclaimer_page())
+    return build_pdf(streams)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic M-PESA statement.')
+    parser.add_argument('--pages', type=int, default=10, help='transaction pages')
+    parser.add_argument('--per-page', type=int, default=20, help='transactions per page')
+    parser.add_argument('--layout', choices=['text', 'organization', 'table'], default='text')
+    parser.add_argument('--names', type=int, default=100, help='distinct counterparty names')
+    parser.add_argument('--single-line-details', action='store_true', help='keep details on one line')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--raw-text', action='store_true', help='write plain statement text instead of a PDF')
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+
+    if args.raw_text:
+        lines = generate_transaction_lines(args.pages * args.per_page, seed=args.seed, n_names=args.names,
+                                           multiline_details=not args.single_line_details)
+        with open(args.output, 'w') as f:
+            f.write('\n'.join(lines))
+        return
+
+    data = generate_statement_pdf(args.pages, args.per_page, args.layout, args.names,
+                                  not args.single_line_details, args.seed)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+
+
+if __name__ == '__main__':
+    main()
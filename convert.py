@@ -0,0 +1,278 @@
+"""Convert a directory tree of M-PESA statements from the command line.
+
+    python convert.py statements/ --output-dir reports/ --format xlsx csv --workers 8
+
+Every PDF under the given directories (and every PDF given directly) is
+converted with mpesync, one output per format at the statement's relative
+path under ``--output-dir`` (default: next to the statement). Statements are
+converted in a process pool, one statement per task, with a progress line on
+stderr; no web server is involved.
+
+A statement is skipped when its outputs are up to date. Each output
+directory keeps a manifest of converted statements: an entry whose size and
+mtime still match is trusted, otherwise the statement's SHA-256 is compared,
+so touched or copied statements are not converted again. Without a manifest
+entry, outputs newer than the statement count as up to date. ``--force``
+converts everything.
+
+Exits with status 1 if any statement failed.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from mpesync import EXPORT_FORMATS, STATEMENT_FORMATS, export_transactions, pool_context, process_pdf
+from pdf_backends import BACKENDS
+from result_cache import content_key
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.mpesync-manifest.json'
+# Completed statements between manifest saves, so an interrupted run keeps its progress
+MANIFEST_SAVE_EVERY = 500
+# Seconds between progress updates
+PROGRESS_INTERVAL = 0.5
+
+
+def find_statements(inputs):
+    """Yield (pdf_path, output_root, relative_stem) for every statement under ``inputs``."""
+    for path in inputs:
+        if os.path.isdir(path):
+            for directory, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.pdf'):
+                        pdf_path = os.path.join(directory, filename)
+                        yield pdf_path, path, os.path.splitext(os.path.relpath(pdf_path, path))[0]
+        elif os.path.isfile(path):
+            yield path, os.path.dirname(path), os.path.splitext(os.path.basename(path))[0]
+        else:
+            raise FileNotFoundError(f'No such file or directory: {path}')
+
+
+class Manifest:
+    """Size, mtime and hash of the statements converted into one output directory."""
+
+    def __init__(self, root):
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.dirty = False
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+            self.entries = {}
+
+    def is_up_to_date(self, stem, pdf_path, output_paths):
+        """True when ``output_paths`` already hold the conversion of ``pdf_path``."""
+        stat = os.stat(pdf_path)
+        entry = self.entries.get(stem)
+        if entry is None:
+            return all(os.path.exists(path) and os.stat(path).st_mtime_ns >= stat.st_mtime_ns
+                       for path in output_paths)
+
+        # Statements without transactions have no outputs to check
+        if entry['transactions'] and not all(os.path.exists(path) for path in output_paths):
+            return False
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        if entry['size'] != stat.st_size:
+            return False
+        with open(pdf_path, 'rb') as f:
+            if content_key(f.read()) != entry['sha256']:
+                return False
+        self.record(stem, pdf_path, entry['sha256'], entry['transactions'])
+        return True
+
+    def record(self, stem, pdf_path, sha256, transactions):
+        stat = os.stat(pdf_path)
+        self.entries[stem] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256,
+                              'transactions': transactions}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class Progress:
+    """Single-line progress report on stderr (a line per update when stderr is not a terminal)."""
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.counts = {'converted': 0, 'skipped': 0, 'empty': 0, 'failed': 0}
+        self.started = self.last_update = time.perf_counter()
+        self.interactive = stream.isatty()
+
+    def update(self, outcome):
+        self.counts[outcome] += 1
+        now = time.perf_counter()
+        done = sum(self.counts.values())
+        interval = PROGRESS_INTERVAL if self.interactive else 30 * PROGRESS_INTERVAL
+        if now - self.last_update >= interval or done == self.total:
+            self.last_update = now
+            self._write(done, now)
+
+    def _write(self, done, now):
+        elapsed = now - self.started
+        converted = self.counts['converted'] + self.counts['empty'] + self.counts['failed']
+        rate = converted / elapsed if elapsed else 0.0
+        remaining = (self.total - done) / rate if rate else 0.0
+        line = (f"[{done}/{self.total}] {self.counts['converted']} converted, {self.counts['skipped']} up to date, "
+                f"{self.counts['empty']} empty, {self.counts['failed']} failed | {rate:.1f} statements/s, "
+                f"ETA {int(remaining // 60)}:{int(remaining % 60):02d}")
+        if self.interactive:
+            self.stream.write(f'\r{line}\033[K')
+        else:
+            self.stream.write(f'{line}\n')
+        self.stream.flush()
+
+    def close(self):
+        if self.interactive:
+            self.stream.write('\n')
+
+
+def _init_worker(log_level):
+    logging.basicConfig(level=log_level, format='%(levelname)s %(name)s: %(message)s')
+
+
+def convert_statement(pdf_path, outputs, backend=None, statement_format=None):
+    """Pool task: convert one statement to each (output_format, path) in ``outputs``.
+
+    Outputs are written to temporary files and renamed into place, so an
+    interrupted run never leaves an output that looks up to date. Returns
+    (number of transactions, SHA-256 of the statement).
+    """
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+    transactions = process_pdf(io.BytesIO(pdf_bytes), workers=0, backend=backend,
+                               statement_format=statement_format)
+
+    for output_format, path in outputs if transactions else ():
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            # Readable too, so xlsx outputs can store their append state
+            with open(tmp_path, 'w+b') as f:
+                export_transactions(transactions, f, output_format)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return len(transactions), content_key(pdf_bytes)
+
+
+def convert_tree(inputs, output_dir=None, formats=('xlsx',), workers=None, backend=None, statement_format=None,
+                 force=False, progress=True, log_level=logging.WARNING):
+    """Convert every statement under ``inputs``; returns the outcome counts.
+
+    The tree is listed first so progress has a total. Only statements that
+    are not up to date are submitted, at most ``2 * workers`` at a time, so
+    memory stays flat however many statements the tree holds.
+    """
+    workers = workers or os.cpu_count() or 1
+    manifests = {}
+    tasks = []
+    for pdf_path, input_root, stem in find_statements(inputs):
+        output_root = output_dir or input_root
+        manifest = manifests.get(output_root)
+        if manifest is None:
+            manifest = manifests[output_root] = Manifest(output_root)
+        outputs = [(output_format, os.path.join(output_root, f'{stem}.{output_format}')) for output_format in formats]
+        tasks.append((pdf_path, stem, manifest, outputs))
+
+    reporter = Progress(len(tasks)) if progress else None
+    counts = {'converted': 0, 'skipped': 0, 'empty': 0, 'failed': 0}
+    completed = 0
+
+    def finish(pdf_path, stem, manifest, outcome, result=None):
+        nonlocal completed
+        if result is not None:
+            transactions, sha256 = result
+            manifest.record(stem, pdf_path, sha256, transactions)
+        counts[outcome] += 1
+        if reporter:
+            reporter.update(outcome)
+        completed += 1
+        if completed % MANIFEST_SAVE_EVERY == 0:
+            for each in manifests.values():
+                each.save()
+
+    def collect(task, future):
+        pdf_path, stem, manifest, _ = task
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Failed to convert {pdf_path}: {str(e)}")
+            finish(pdf_path, stem, manifest, 'failed')
+            return
+        finish(pdf_path, stem, manifest, 'converted' if result[0] else 'empty', result)
+
+    try:
+        pending = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context, initializer=_init_worker,
+                                 initargs=(log_level,)) as executor:
+            for task in tasks:
+                pdf_path, stem, manifest, outputs = task
+                if not force and manifest.is_up_to_date(stem, pdf_path, [path for _, path in outputs]):
+                    finish(pdf_path, stem, manifest, 'skipped')
+                    continue
+                pending[executor.submit(convert_statement, pdf_path, outputs, backend, statement_format)] = task
+                while len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(pending.pop(future), future)
+            for future in list(pending):
+                collect(pending.pop(future), future)
+    finally:
+        if reporter:
+            reporter.close()
+        for manifest in manifests.values():
+            manifest.save()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert M-PESA statement PDFs to Excel, CSV or Parquet.')
+    parser.add_argument('inputs', nargs='+', help='statement PDFs and/or directories searched recursively')
+    parser.add_argument('-o', '--output-dir', help='directory for the outputs (default: next to each statement)')
+    parser.add_argument('-f', '--format', nargs='+', choices=EXPORT_FORMATS, default=['xlsx'], dest='formats',
+                        help='output formats (default: xlsx)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='statements converted in parallel (default: CPU count)')
+    parser.add_argument('--backend', choices=['auto'] + list(BACKENDS), help='PDF text backend (default: auto)')
+    parser.add_argument('--statement-format', choices=['auto'] + list(STATEMENT_FORMATS),
+                        help='statement layout (default: detected)')
+    parser.add_argument('--force', action='store_true', help='convert statements even if their outputs are up to date')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress line')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log each statement')
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    _init_worker(log_level)
+
+    started = time.perf_counter()
+    counts = convert_tree(args.inputs, args.output_dir, args.formats, args.workers, args.backend,
+                          args.statement_format, force=args.force, progress=not args.quiet, log_level=log_level)
+    print(f"{counts['converted']} converted, {counts['skipped']} up to date, {counts['empty']} without transactions, "
+          f"{counts['failed']} failed in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""gunicorn settings for wsgi.py; every value can be overridden from the environment.
+
+Preforked workers each serve requests on a few threads (conversions spend
+much of their time in C extensions, and /jobs work runs on its own threads).
+Workers are recycled after a number of requests, or as soon as their
+resident memory passes MPESYNC_WORKER_MAX_RSS_MB, so memory held on to after
+a large statement is given back to the system.
+
+Both apps run one worker per CPU by default. wsgi:app keeps /jobs state and
+results in MPESYNC_JOB_DIR, which every worker reads, so any worker can
+answer for a job; a worker is only kept from recycling while it is running
+jobs itself.
+"""
+import os
+import random
+import sys
+
+bind = os.environ.get('MPESYNC_BIND', '127.0.0.1:8000')
+worker_class = 'gthread'
+workers = int(os.environ.get('MPESYNC_WSGI_WORKERS', str(os.cpu_count() or 1)))
+threads = int(os.environ.get('MPESYNC_WSGI_THREADS', '4'))
+
+# Longer than MPESYNC_MAX_PDF_SECONDS, so the app's own budget answers first
+timeout = int(os.environ.get('MPESYNC_WSGI_TIMEOUT', '360'))
+graceful_timeout = 30
+
+# Restart each worker after this many requests (jittered so they do not all
+# restart at once), and after any request that leaves it above the RSS limit.
+# gunicorn's own max_requests would restart a worker with jobs still running,
+# so post_request does the counting instead.
+max_requests = 0
+MAX_REQUESTS = int(os.environ.get('MPESYNC_WSGI_MAX_REQUESTS', '500'))
+MAX_REQUESTS_JITTER = int(os.environ.get('MPESYNC_WSGI_MAX_REQUESTS_JITTER', '50'))
+WORKER_MAX_RSS_MB = int(os.environ.get('MPESYNC_WORKER_MAX_RSS_MB', '1024'))
+
+accesslog = '-'
+loglevel = os.environ.get('MPESYNC_LOG_LEVEL', 'info')
+
+# Heartbeat files on tmpfs so a busy disk cannot stall workers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def _rss_mb():
+    """Current resident set size of this process in MiB (Linux), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _job_manager():
+    """app.py's job manager, if this worker has loaded it."""
+    app_module = sys.modules.get('app')
+    return getattr(app_module, 'job_manager', None)
+
+
+def post_fork(server, worker):
+    worker.recycle_after = MAX_REQUESTS + random.randint(0, MAX_REQUESTS_JITTER) if MAX_REQUESTS else 0
+
+
+def post_request(worker, req, environ, resp):
+    if not worker.alive:
+        return
+
+    reason = None
+    if worker.recycle_after and worker.nr >= worker.recycle_after:
+        reason = f'served {worker.nr} requests'
+    else:
+        rss = _rss_mb()
+        if WORKER_MAX_RSS_MB and rss is not None and rss > WORKER_MAX_RSS_MB:
+            reason = f'at {rss:.0f} MiB RSS, above {WORKER_MAX_RSS_MB} MiB'
+    if reason is None:
+        return
+
+    # Exiting would fail the jobs this worker is running; try again after a later request
+    job_manager = _job_manager()
+    if job_manager is not None and job_manager.pending():
+        worker.log.debug(f"Worker {worker.pid} {reason}; recycling deferred until its jobs finish")
+        return
+
+    worker.log.info(f"Worker {worker.pid} {reason}; recycling")
+    # Finish in-flight requests, then exit; the arbiter starts a fresh worker
+    worker.alive = False
+
+
+def worker_exit(server, worker):
+    # Record this worker's unfinished jobs as failed; finished ones stay for the other workers to serve
+    job_manager = _job_manager()
+    if job_manager is not None:
+        job_manager.shutdown()
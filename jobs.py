@@ -0,0 +1,218 @@
+"""Background jobs for statement conversion.
+
+Jobs run on a bounded thread pool with a limit on how many may wait in the
+queue, so no external broker is needed. Each job's state is kept as a JSON
+file in the manager's ``job_dir``, next to the result file the job writes
+there. Any process using the same directory can therefore report a job's
+status and serve its result, whichever process ran it. Both files are
+removed when the job expires.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the pool and its queue are saturated."""
+
+
+class Job:
+    """State of a single background job, saved to ``state_path`` on every change."""
+
+    def __init__(self, state_path=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.state_path = state_path
+        self.status = 'queued'
+        self.pages_done = 0
+        self.pages_total = None
+        self.result_path = None
+        self.error = None
+        # HTTP status to report a failure with
+        self.error_status = 500
+        self.created_at = time.time()
+        self.finished_at = None
+        # Set by a final update, after which the state is never written again
+        self._final = False
+        self._lock = threading.Lock()
+
+    def update(self, final=False, **fields):
+        """Set ``fields`` and save the state, unless a final update came first."""
+        with self._lock:
+            if self._final:
+                return
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._save()
+            self._final = final
+
+    def set_progress(self, pages_done, pages_total):
+        self.update(pages_done=pages_done, pages_total=pages_total)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'error': self.error,
+            'error_status': self.error_status if self.status == 'failed' else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+    def _save(self):
+        # The rename is atomic, so readers never see a partial file
+        state = dict(self.to_dict(), result_path=self.result_path, error_status=self.error_status)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def load(cls, state_path):
+        """The job saved at ``state_path``, or None if there is none."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        job = cls(state_path, state.pop('id'))
+        for name, value in state.items():
+            setattr(job, name, value)
+        return job
+
+
+class JobManager:
+    """Runs jobs on a bounded pool and keeps their state on disk until they expire.
+
+    At most ``max_workers`` jobs run at once in this process and at most
+    ``max_queued`` more may wait; submitting beyond that raises JobQueueFull.
+    Jobs and their result files are dropped ``ttl`` seconds after completion,
+    by whichever process sharing ``job_dir`` next submits a job.
+    """
+
+    def __init__(self, job_dir=None, max_workers=2, max_queued=8, ttl=3600):
+        self.job_dir = job_dir or os.path.join(tempfile.gettempdir(), 'mpesync-jobs')
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mpesync-job')
+        # Jobs of this process that have not finished yet
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.job_dir, exist_ok=True)
+
+    def submit(self, func, *args):
+        """Queue ``func(job, *args)``, which must return the path of a result file in ``job_dir``."""
+        self._expire()
+        with self._lock:
+            if len(self._jobs) >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"{len(self._jobs)} jobs already pending")
+            job = Job()
+            job.state_path = self._state_path(job.id)
+            self._jobs[job.id] = job
+        job.update()
+
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def get(self, job_id):
+        """The job with id ``job_id``, as last saved by the process running it, or None."""
+        if not JOB_ID_RE.fullmatch(job_id):
+            return None
+        job = Job.load(self._state_path(job_id))
+        if job is None or self._expired(job, time.time() - self.ttl):
+            return None
+        return job
+
+    def pending(self):
+        """Number of jobs queued or running in this process."""
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self):
+        """Cancel queued jobs and record them, and those still running, as failed.
+
+        Finished jobs are left in place for other processes to serve; partial
+        results of the running ones are removed once they expire.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            unfinished = list(self._jobs.values())
+            self._jobs.clear()
+
+        # Final, so a job still running cannot report itself done later
+        for job in unfinished:
+            job.update(final=True, status='failed', error='The server shut down before the job finished',
+                       finished_at=time.time())
+
+    def _run(self, job, func, args):
+        job.update(status='running')
+        try:
+            result_path = func(job, *args)
+            job.update(status='done', result_path=result_path, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            job.update(status='failed', error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    @staticmethod
+    def _expired(job, cutoff):
+        # Unfinished jobs that outlive the TTL belong to a process that died
+        return (job.finished_at or job.created_at) < cutoff
+
+    @staticmethod
+    def _remove_result(job):
+        if job.result_path:
+            try:
+                os.remove(job.result_path)
+            except FileNotFoundError:
+                pass
+
+    def _expire(self):
+        """Delete the state and result files of every job in ``job_dir`` older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            if not name.endswith('.json'):
+                # Results and temporary files are at most as old as their job,
+                # so this also clears those left behind by a process that died
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            with self._lock:
+                if name[:-len('.json')] in self._jobs:
+                    continue
+            try:
+                job = Job.load(path)
+            except Exception as e:
+                logger.error(f"Error reading job state {name}: {str(e)}")
+                continue
+            if job is None or not self._expired(job, cutoff):
+                continue
+            self._remove_result(job)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
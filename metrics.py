@@ -0,0 +1,116 @@
+"""Minimal Prometheus-style metrics for the conversion pipeline.
+
+Counters and histograms are kept in process memory and rendered in the
+Prometheus text exposition format by ``render()``. Each server process has
+its own registry.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}')
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values (seconds) in cumulative buckets."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        with _lock:
+            _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent in the ``with`` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with _lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(list(zip(self.labelnames, key)) + [('le', repr(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(list(zip(self.labelnames, key)) + [('le', '+Inf')])
+                lines.append(f'{self.name}_bucket{labels} {series[-1]}')
+                labels = _format_labels(list(zip(self.labelnames, key)))
+                lines.append(f'{self.name}_sum{labels} {series[-2]}')
+                lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram(
+    'mpesync_stage_seconds',
+    'Time spent in each conversion stage (pdf_open, page_filter, page_extract, parse, pivot, excel_write).',
+    labelnames=('stage',),
+)
+PAGES_TOTAL = Counter('mpesync_pages_total', 'PDF pages processed.')
+PAGES_SKIPPED_TOTAL = Counter('mpesync_pages_skipped_total', 'PDF pages skipped by the content pre-filter.')
+TRANSACTIONS_TOTAL = Counter('mpesync_transactions_total', 'Transactions parsed from statements.')
+CONVERSIONS_TOTAL = Counter('mpesync_conversions_total', 'Statement conversions by route and outcome.',
+                            labelnames=('route', 'outcome'))
@@ -0,0 +1,1292 @@
+"""Statement conversion library: PDF parsing, monthly summaries and reports.
+
+Everything the web app does to a statement, without Flask. ``process_pdf``
+turns a PDF into Transaction records, ``build_workbook`` and
+``write_workbook_streaming`` write the Excel report, ``export_transactions``
+writes CSV or Parquet, and ``process_statement_batch`` merges many
+statements. app.py serves these over HTTP; convert.py runs them over a
+directory tree from the command line.
+"""
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date
+from xml.sax.saxutils import escape, unescape
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.utility import xl_range
+
+from pdf_backends import backends_faster_than, open_pdf, select_backend
+from metrics import STAGE_SECONDS, PAGES_TOTAL, PAGES_SKIPPED_TOTAL, TRANSACTIONS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for PDF page extraction; 0 or 1 processes pages serially
+PDF_WORKERS = int(os.environ.get('MPESYNC_PDF_WORKERS', '0'))
+# Documents with fewer pages than this are always processed serially
+PARALLEL_MIN_PAGES = int(os.environ.get('MPESYNC_PARALLEL_MIN_PAGES', '16'))
+
+# Start method of the page and batch process pools (default: the platform's).
+# Forking a threaded server worker can deadlock the children, so wsgi.py uses
+# 'forkserver', with this module preloaded so new pools start quickly.
+POOL_START_METHOD = os.environ.get('MPESYNC_POOL_START_METHOD') or None
+pool_context = multiprocessing.get_context(POOL_START_METHOD)
+if POOL_START_METHOD == 'forkserver' and __name__ != '__main__':
+    pool_context.set_forkserver_preload([__name__])
+
+# Text extraction backend (see pdf_backends), or 'auto' to probe each document
+# and use the fastest backend that matches PyPDF2 on its first pages
+PDF_BACKEND = os.environ.get('MPESYNC_PDF_BACKEND', 'auto')
+REFERENCE_PDF_BACKEND = 'pypdf2'
+BACKEND_PROBE_PAGES = 3
+
+# Skip pages whose raw content shows they hold no transactions before
+# extracting their text (see _candidate_pages)
+PAGE_FILTER = os.environ.get('MPESYNC_PAGE_FILTER', '1') != '0'
+
+# Budgets that stop abusive statements from tying up workers: bytes, pages
+# and seconds of processing per statement (0 disables a budget)
+MAX_PDF_BYTES = int(os.environ.get('MPESYNC_MAX_PDF_BYTES', str(64 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.environ.get('MPESYNC_MAX_PDF_PAGES', '5000'))
+MAX_PDF_SECONDS = float(os.environ.get('MPESYNC_MAX_PDF_SECONDS', '300'))
+
+# Fraction of pages whose first 200 characters are logged. Page text contains
+# customer data, so this is for debugging only and off by default.
+PAGE_TEXT_LOG_SAMPLE = float(os.environ.get('MPESYNC_DEBUG_PAGE_TEXT_SAMPLE', '0'))
+
+# Statements with at least this many transactions are written with the
+# constant-memory workbook writer
+STREAMING_MIN_TRANSACTIONS = int(os.environ.get('MPESYNC_STREAMING_MIN_TRANSACTIONS', '20000'))
+
+# Worker processes used by process_statement_batch
+BATCH_WORKERS = int(os.environ.get('MPESYNC_BATCH_WORKERS', str(os.cpu_count() or 2)))
+
+
+# Columns the monthly summary is grouped by; batch reports add 'Source'
+SUMMARY_KEYS = ('Name', 'Account')
+
+
+@dataclass(frozen=True)
+class StatementFormat:
+    """Precompiled patterns for one M-PESA statement layout.
+
+    ``header`` matches the first line of an entry and captures its receipt
+    number and date, and may capture the time as a third group; otherwise
+    ``time`` is searched in the rest of that line. The other patterns are
+    searched in the entry's joined detail lines, ``names`` in order of
+    specificity. ``amount`` captures the amount as its first group, or as
+    ``paid_in`` and ``withdrawn`` groups for layouts with both columns. With
+    ``inline_details`` the rest of the header line is the first detail line.
+    ``detect`` recognises the layout from the text of a statement's first
+    page.
+    """
+    name: str
+    detect: re.Pattern
+    header: re.Pattern
+    time: re.Pattern
+    amount: re.Pattern
+    names: tuple
+    account: re.Pattern
+    inline_details: bool = False
+
+
+# Statement layouts by name, in detection order; see register_format
+STATEMENT_FORMATS = {}
+
+
+def register_format(name, detect, header, time, amount, names, account, inline_details=False):
+    """Compile and register the patterns of a statement layout."""
+    statement_format = StatementFormat(
+        name=name,
+        detect=re.compile(detect),
+        header=re.compile(header),
+        time=re.compile(time),
+        amount=re.compile(amount),
+        names=tuple(re.compile(pattern) for pattern in names),
+        account=re.compile(account),
+        inline_details=inline_details,
+    )
+    STATEMENT_FORMATS[name] = statement_format
+    return statement_format
+
+
+# Personal statements: "SAO4YDEXQY 2024-01-24 10:15:00 Pay Bill Online" then
+# "Funds received from 254******123 - NAME Acc. 12345 Completed 1,000.00 ..."
+CUSTOMER_FORMAT = register_format(
+    'customer',
+    detect=r'Customer Name',
+    header=r'([A-Z0-9]{9,10})\s+(\d{4}-\d{2}-\d{2})',
+    time=r'(\d{2}:\d{2}:\d{2})',
+    amount=r'Completed\s+([\d,]+\.\d{2})',
+    names=[
+        r'from\s+254\*+\d+\s*-\s*([^-]+?)\s+Acc\.',  # Matches "from 254***** - NAME Acc."
+        r'-\s*([^-]+?)\s+Acc\.',  # Matches "- NAME Acc."
+    ],
+    account=r'Acc\.\s*([^C]+?)(?=\s*Completed|$)',
+)
+
+# Till and paybill (organisation) statements: one row per entry,
+# "SAO4YDEXQY 2024-01-24 11:14:58 2024-01-24 11:14:56 Pay Bill Online to
+# 888880 - NAME Completed 0.00 -1,000.00 5,000.00". The header takes in the
+# completion and initiation times, so the details (and the hyphens the name
+# patterns look for) start after them. Till payments have no account, so
+# names end at the status column instead of "Acc.". Paid In and Withdrawn
+# are both printed; withdrawals are negative whether or not they are signed.
+ORGANIZATION_FORMAT = register_format(
+    'organization',
+    detect=r'Organi[sz]ation Name|Short ?[Cc]ode|Till Number',
+    header=r'([A-Z0-9]{9,10})\s+(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2}:\d{2})(?:\s+\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})?',
+    time=r'(\d{2}:\d{2}:\d{2})',
+    amount=r'Completed\s+(?P<paid_in>-?[\d,]+\.\d{2})\s+(?P<withdrawn>-?[\d,]+\.\d{2})\s+-?[\d,]+\.\d{2}',
+    names=[
+        r'from\s+\d*\**\d+\s*-\s*([^-]+?)(?=\s+Acc\.|\s+Completed)',
+        r'-\s*([^-]+?)(?=\s+Acc\.|\s+Completed)',
+    ],
+    account=r'Acc\.\s*([^C]+?)(?=\s*Completed|$)',
+    inline_details=True,
+)
+
+# Layout used when a statement's first page matches no format's detect pattern
+DEFAULT_STATEMENT_FORMAT = 'customer'
+
+# Statement layout to parse with, or 'auto' to detect it from the first page
+STATEMENT_FORMAT = os.environ.get('MPESYNC_STATEMENT_FORMAT', 'auto')
+
+
+def get_statement_format(name):
+    """The registered format called ``name``; 'auto' (or None) gives None, meaning detect."""
+    if name in (None, 'auto'):
+        return None
+    if name not in STATEMENT_FORMATS:
+        raise ValueError(f"Unknown statement format '{name}'. Choose from: auto, {', '.join(STATEMENT_FORMATS)}")
+    return STATEMENT_FORMATS[name]
+
+
+def detect_statement_format(text):
+    """The first registered format whose detect pattern is found in ``text`` (a first page)."""
+    for statement_format in STATEMENT_FORMATS.values():
+        if statement_format.detect.search(text):
+            return statement_format
+    return STATEMENT_FORMATS[DEFAULT_STATEMENT_FORMAT]
+
+
+@dataclass(slots=True)
+class Transaction:
+    """One statement entry.
+
+    Slotted rather than a dict so that large statements stay compact. The
+    date is parsed once, when the header line is read, and the amount is
+    kept as integer cents. Report columns ('Reference', 'Amount', ...) map
+    to the lower-case attributes; see ``field``.
+    """
+    reference: str
+    date: date
+    time: str = None
+    amount_cents: int = None
+    name: str = None
+    account: str = None
+    source: str = None
+
+    @property
+    def amount(self):
+        return None if self.amount_cents is None else self.amount_cents / 100
+
+    def field(self, column):
+        """Value of a report column, e.g. field('Amount')."""
+        return getattr(self, column.lower())
+
+
+def _start_transaction(line, header_match, statement_format):
+    """Create a transaction record from a header line and its header match."""
+    transaction = Transaction(header_match.group(1), date.fromisoformat(header_match.group(2)))
+
+    if header_match.lastindex >= 3:
+        transaction.time = header_match.group(3)
+        return transaction
+
+    # The time follows the date, so there is no need to rescan the start of the line
+    time_match = statement_format.time.search(line, header_match.end())
+    if time_match:
+        transaction.time = time_match.group(1)
+
+    return transaction
+
+
+def _cents(amount_text):
+    """'-n,nnn.nn' as integer cents."""
+    return int(amount_text.replace(',', '').replace('.', ''))
+
+
+def _finish_transaction(transaction, details_lines, statement_format):
+    """Fill amount, name and account from the detail lines collected for a transaction."""
+    details_text = ' '.join(details_lines)
+
+    # Extract amount
+    amount_match = statement_format.amount.search(details_text)
+    if amount_match:
+        if 'withdrawn' in amount_match.re.groupindex:
+            transaction.amount_cents = (_cents(amount_match.group('paid_in'))
+                                        - abs(_cents(amount_match.group('withdrawn'))))
+        else:
+            transaction.amount_cents = _cents(amount_match.group(1))
+
+    # Extract name, trying the patterns in order of specificity. Names and
+    # accounts repeat across a statement, so equal values share one string
+    for pattern in statement_format.names:
+        name_match = pattern.search(details_text)
+        if name_match:
+            transaction.name = sys.intern(name_match.group(1).strip())
+            break
+
+    # Extract account number
+    acc_match = statement_format.account.search(details_text)
+    if acc_match:
+        transaction.account = sys.intern(acc_match.group(1).strip())
+
+    return transaction
+
+
+class TransactionParser:
+    """Incremental M-PESA statement parser.
+
+    Text can be fed one page at a time. Only the transaction still open at the
+    end of a chunk (its header and detail lines so far) is carried over, so
+    details that continue onto the next page are attached to the right record
+    without ever holding the whole document's text.
+
+    Lines are parsed with the patterns of ``statement_format``; when it is
+    None the layout is detected from the first chunk fed (the first page).
+    """
+
+    def __init__(self, keep_leading_lines=False, statement_format=None):
+        self.statement_format = statement_format
+        self.current_transaction = None
+        self.details_lines = []
+        # Set after a header that could not be parsed, until the next header
+        self.skipping_entry = False
+        # Detail lines seen before the first header. Kept when pages are parsed
+        # independently so they can be stitched onto the previous page later.
+        self.keep_leading_lines = keep_leading_lines
+        self.leading_lines = []
+
+    def feed(self, text_content):
+        """Parse a chunk of text and return the transactions it completed."""
+        completed = []
+        if self.statement_format is None:
+            self.statement_format = detect_statement_format(text_content)
+            logger.info(f"Statement format: {self.statement_format.name}")
+        statement_format = self.statement_format
+        header_match = statement_format.header.match
+
+        # Split into lines
+        lines = text_content.split('\n')
+        logger.debug(f"Number of lines: {len(lines)}")
+
+        for i, raw_line in enumerate(lines):
+            try:
+                line = raw_line.strip()
+                if not line:
+                    continue
+
+                header = header_match(line)
+                if header:
+                    # Start the new record before finishing the previous one, so
+                    # a header that fails to parse cannot leave it open twice
+                    try:
+                        transaction = _start_transaction(line, header, statement_format)
+                    except ValueError as e:
+                        logger.error(f"Skipping entry on line {i}: {str(e)}")
+                        transaction = None
+
+                    # Save previous transaction if exists
+                    if self.current_transaction is not None:
+                        completed.append(_finish_transaction(self.current_transaction, self.details_lines,
+                                                             statement_format))
+
+                    # The details of a skipped entry are dropped with it
+                    self.current_transaction = transaction
+                    self.skipping_entry = transaction is None
+                    self.details_lines = [line[header.end():]] if statement_format.inline_details else []
+                elif self.current_transaction is not None:
+                    self.details_lines.append(line)
+                elif self.keep_leading_lines and not self.skipping_entry:
+                    self.leading_lines.append(line)
+
+            except Exception as e:
+                logger.error(f"Error processing line {i}: {str(e)}")
+                logger.error(traceback.format_exc())
+                continue
+
+        return completed
+
+    def close(self):
+        """Finish the open transaction, if any, and return it as a list."""
+        if self.current_transaction is None:
+            return []
+        transaction = _finish_transaction(self.current_transaction, self.details_lines, self.statement_format)
+        self.current_transaction = None
+        self.details_lines = []
+        return [transaction]
+
+    def take_open_transaction(self):
+        """Detach the open transaction and return it as (transaction, details_lines), or None."""
+        if self.current_transaction is None:
+            return None
+        open_transaction = (self.current_transaction, self.details_lines)
+        self.current_transaction = None
+        self.details_lines = []
+        return open_transaction
+
+    def entry_incomplete(self):
+        """True while the open transaction's details have not reached its amount."""
+        return (self.current_transaction is not None
+                and not self.statement_format.amount.search(' '.join(self.details_lines)))
+
+    def absorb(self, leading_lines, transactions, open_transaction):
+        """Merge the fragments of a page parsed on its own, in document order.
+
+        ``leading_lines`` continue the currently open transaction, ``transactions``
+        were completed within the page and ``open_transaction`` (from
+        take_open_transaction) becomes the new open transaction. Returns the
+        transactions completed by the merge.
+        """
+        completed = []
+        if self.current_transaction is not None:
+            self.details_lines.extend(leading_lines)
+            if transactions or open_transaction is not None:
+                completed.extend(self.close())
+
+        completed.extend(transactions)
+        if open_transaction is not None:
+            self.current_transaction, self.details_lines = open_transaction
+        return completed
+
+
+def extract_transaction_details(text_content, statement_format=None):
+    """Extract transaction details from M-PESA statement text.
+
+    The layout is detected from the text unless a ``statement_format`` is given.
+    """
+    parser = TransactionParser(statement_format=statement_format)
+    transactions = parser.feed(text_content)
+    transactions.extend(parser.close())
+
+    logger.info(f"Extracted {len(transactions)} transactions")
+    return transactions
+
+
+def _log_page_text(page_num, text):
+    """Log the start of a page's text for a sampled fraction of pages (debugging only)."""
+    if PAGE_TEXT_LOG_SAMPLE and random.random() < PAGE_TEXT_LOG_SAMPLE:
+        logger.info(f"Page {page_num + 1} text sample: {text[:200]}")
+
+
+class StatementTooLarge(ValueError):
+    """Raised when a statement exceeds the byte, page or time budget."""
+
+
+def _check_deadline(deadline):
+    if deadline is not None and time.monotonic() > deadline:
+        raise StatementTooLarge(f'Statement took longer than {MAX_PDF_SECONDS:g} seconds to process')
+
+
+# Raw content stream checks used by _candidate_pages. A page's bytes can only
+# be trusted when its text is drawn as readable literal strings; kerned (TJ),
+# hex and custom-encoded text must be extracted to be read.
+CONTENT_DATE_RE = re.compile(rb'\d{4}-\d{2}-\d{2}')
+CONTENT_OPAQUE_TEXT_RE = re.compile(rb'TJ|>\s*Tj')
+CONTENT_READABLE_TEXT_RE = re.compile(rb'\([^()\\]*[A-Za-z]{4}')
+
+
+def _may_hold_transactions(content):
+    """Cheap check of a page's raw content stream; False only for pages sure to hold no entries."""
+    if content is None or CONTENT_DATE_RE.search(content):
+        return True
+    return bool(CONTENT_OPAQUE_TEXT_RE.search(content) or not CONTENT_READABLE_TEXT_RE.search(content))
+
+
+def _candidate_pages(content_document):
+    """Page numbers that may hold entry headers, judged from their content streams.
+
+    Every entry header carries a date, so pages without one (cover, summary
+    and disclaimer pages) are left out. The pages between candidates are only
+    extracted while an entry's details are still running onto them (see
+    _continuation_pages).
+    """
+    pages = []
+    for page_num in range(content_document.page_count):
+        try:
+            candidate = _may_hold_transactions(content_document.page_content(page_num))
+        except Exception as e:
+            logger.warning(f"Could not read the content of page {page_num + 1}: {str(e)}")
+            candidate = True
+        if candidate:
+            pages.append(page_num)
+    return pages
+
+
+def _continuation_pages(parser, page_nums):
+    """Yield the skipped ``page_nums`` in order while the parser's open entry is incomplete.
+
+    Skipped pages hold no header, so the only thing they can add is the rest
+    of the open entry's details; once its amount has been read, they are
+    not extracted.
+    """
+    for page_num in page_nums:
+        if not parser.entry_incomplete():
+            return
+        yield page_num
+
+
+def _content_document(pdf_bytes, document, backend):
+    """A PyPDF2 document to read content streams from: ``document`` itself if
+    it is one, a new one otherwise, or None if PyPDF2 cannot open the file."""
+    if backend == REFERENCE_PDF_BACKEND:
+        return document
+    try:
+        return open_pdf(pdf_bytes, REFERENCE_PDF_BACKEND)
+    except Exception as e:
+        logger.warning(f"Could not read content streams, extracting every page: {str(e)}")
+        return None
+
+
+def _first_page_format(content_document, document):
+    """Detect the layout from the first page without parsing it.
+
+    The detect patterns are tried on the page's content stream first, which
+    holds the cover text when it is drawn as literal strings, and then on the
+    text extracted from ``document``.
+    """
+    try:
+        content = (content_document.page_content(0) or b'').decode('latin-1') if content_document else ''
+    except Exception:
+        content = ''
+    for statement_format in STATEMENT_FORMATS.values():
+        if statement_format.detect.search(content):
+            return statement_format
+    return detect_statement_format(document.page_text(0))
+
+
+def _process_page(document, page_num, parser):
+    """Extract a page of ``document`` and feed it to ``parser``.
+
+    Returns (completed transactions, extract seconds, parse seconds).
+    """
+    extract_seconds = parse_seconds = 0.0
+    try:
+        started = time.perf_counter()
+        text = document.page_text(page_num)
+        extract_seconds = time.perf_counter() - started
+        _log_page_text(page_num, text)
+
+        started = time.perf_counter()
+        transactions = parser.feed(text)
+        parse_seconds = time.perf_counter() - started
+        logger.debug(f"Transactions completed on page {page_num + 1}: {len(transactions)}")
+
+    except Exception as e:
+        logger.error(f"Error processing page {page_num + 1}: {str(e)}")
+        logger.error(traceback.format_exc())
+        transactions = []
+
+    return transactions, extract_seconds, parse_seconds
+
+
+# PDF document and statement format of the current pool worker, set once per
+# worker by the pool initializer
+_worker_document = None
+_worker_statement_format = None
+
+
+def _init_page_worker(pdf_bytes, backend, statement_format_name):
+    global _worker_document, _worker_statement_format
+    _worker_document = open_pdf(pdf_bytes, backend)
+    _worker_statement_format = STATEMENT_FORMATS[statement_format_name]
+
+
+def _process_pages(page_nums):
+    """Pool task: parse each of ``page_nums`` of the worker's PDF independently.
+
+    Each page yields (page_num, leading_lines, transactions, open_transaction,
+    extract_seconds, parse_seconds) so the parent can stitch transactions that
+    cross page boundaries and record the timings.
+    """
+    results = []
+    for page_num in page_nums:
+        parser = TransactionParser(keep_leading_lines=True, statement_format=_worker_statement_format)
+        transactions, extract_seconds, parse_seconds = _process_page(_worker_document, page_num, parser)
+        results.append((page_num, parser.leading_lines, transactions, parser.take_open_transaction(),
+                        extract_seconds, parse_seconds))
+    return results
+
+
+def _read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file, file object or path."""
+    if hasattr(pdf_file, 'read'):
+        return pdf_file.read()
+    with open(pdf_file, 'rb') as f:
+        return f.read()
+
+
+def _parse_probe_pages(texts):
+    # Every probe page is parsed with the layout of the first
+    statement_format = detect_statement_format(texts[0]) if texts else None
+    return [extract_transaction_details(text, statement_format) for text in texts]
+
+
+def choose_pdf_backend(pdf_bytes):
+    """Pick the fastest installed backend that parses the first pages exactly like PyPDF2.
+
+    PyPDF2 is the reference extractor the parser was written against; a faster
+    backend is only used when its probe pages yield the same transactions.
+    """
+    with open_pdf(pdf_bytes, REFERENCE_PDF_BACKEND) as document:
+        # Probing would cost as much as reading a short statement outright
+        if document.page_count <= BACKEND_PROBE_PAGES:
+            return REFERENCE_PDF_BACKEND
+        reference = _parse_probe_pages([document.page_text(page_num) for page_num in range(BACKEND_PROBE_PAGES)])
+
+    # Nothing to compare against, so stay with the reference
+    if not any(reference):
+        return REFERENCE_PDF_BACKEND
+
+    def accept(name, texts):
+        return _parse_probe_pages(texts) == reference
+
+    return (select_backend(pdf_bytes, accept, backends_faster_than(REFERENCE_PDF_BACKEND), BACKEND_PROBE_PAGES)
+            or REFERENCE_PDF_BACKEND)
+
+
+def process_pdf(pdf_file, workers=None, page_timings=None, progress=None, backend=None, statement_format=None):
+    """Process PDF and extract transactions.
+
+    Text is extracted with the named ``backend`` (see pdf_backends; default
+    ``PDF_BACKEND``), or with the fastest accurate one when it is 'auto'.
+    Lines are parsed with the patterns of the named ``statement_format``
+    (default ``STATEMENT_FORMAT``), detected from the first page when 'auto'.
+    With ``workers`` > 1 (default ``PDF_WORKERS``) pages are extracted and parsed
+    in a process pool; documents shorter than ``PARALLEL_MIN_PAGES`` are always
+    processed serially. Results are merged in page order either way, and
+    transactions whose details continue onto the next page are stitched back
+    together. If ``page_timings`` is a list, one dict per page is appended to
+    it with the page number, seconds spent (in total, extracting text and
+    parsing) and number of transactions completed on that page. ``progress``
+    is called as progress(pages_done, pages_total) as pages complete.
+
+    With ``PAGE_FILTER`` on, pages whose raw content (read with PyPDF2 whatever
+    the backend) shows no entry header are skipped without extracting their
+    text, unless the entry open at the end of the previous page has not reached
+    its amount yet. Statements over ``MAX_PDF_BYTES``
+    or ``MAX_PDF_PAGES``, or still running after ``MAX_PDF_SECONDS``, raise
+    StatementTooLarge.
+    """
+    if workers is None:
+        workers = PDF_WORKERS
+    backend = backend or PDF_BACKEND
+    statement_format = get_statement_format(statement_format or STATEMENT_FORMAT)
+    deadline = time.monotonic() + MAX_PDF_SECONDS if MAX_PDF_SECONDS else None
+    page_results = []
+
+    try:
+        pdf_bytes = _read_pdf_bytes(pdf_file)
+        if MAX_PDF_BYTES and len(pdf_bytes) > MAX_PDF_BYTES:
+            raise StatementTooLarge(f'Statement is larger than {MAX_PDF_BYTES} bytes')
+
+        with STAGE_SECONDS.time(stage='pdf_open'):
+            if backend == 'auto':
+                backend = choose_pdf_backend(pdf_bytes)
+            document = open_pdf(pdf_bytes, backend)
+            page_count = document.page_count
+        logger.info(f"PDF loaded successfully with {backend}. Number of pages: {page_count}")
+        if MAX_PDF_PAGES and page_count > MAX_PDF_PAGES:
+            document.close()
+            raise StatementTooLarge(f'Statement has {page_count} pages, more than the limit of {MAX_PDF_PAGES}')
+
+        with document:
+            pages = range(page_count)
+            content_document = None
+            if PAGE_FILTER or statement_format is None:
+                # Content streams are read with PyPDF2 whichever backend extracts the text
+                content_document = _content_document(pdf_bytes, document, backend)
+            try:
+                if PAGE_FILTER and content_document is not None:
+                    with STAGE_SECONDS.time(stage='page_filter'):
+                        pages = _candidate_pages(content_document)
+                    logger.info(f"{len(pages)} of {page_count} pages may hold entries")
+                parallel = workers > 1 and len(pages) >= PARALLEL_MIN_PAGES
+
+                # Workers parse pages on their own, and the filter may skip the
+                # first page, so in either case settle the layout up front
+                if statement_format is None and (parallel or not pages or pages[0] != 0):
+                    statement_format = _first_page_format(content_document, document)
+                    logger.info(f"Statement format: {statement_format.name}")
+            finally:
+                if content_document is not None and content_document is not document:
+                    content_document.close()
+
+            parser = TransactionParser(statement_format=statement_format)
+            pages_total = len(pages)
+            if progress:
+                progress(0, pages_total)
+
+            def extract_skipped(page_nums):
+                """Extract, in this process, the skipped pages the open entry runs onto."""
+                nonlocal pages_total
+                for page_num in _continuation_pages(parser, page_nums):
+                    _check_deadline(deadline)
+                    transactions, extract_seconds, parse_seconds = _process_page(document, page_num, parser)
+                    page_results.append((page_num, transactions, extract_seconds, parse_seconds))
+                    pages_total += 1
+
+            if parallel:
+                workers = min(workers, len(pages))
+                logger.info(f"Processing {len(pages)} pages with {workers} worker processes")
+
+                # A few contiguous chunks per worker keeps the pool busy without
+                # paying task overhead for every page
+                chunk_size = max(1, len(pages) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context,
+                                         initializer=_init_page_worker,
+                                         initargs=(pdf_bytes, backend, statement_format.name)) as executor:
+                    futures = [executor.submit(_process_pages, pages[start:start + chunk_size])
+                               for start in range(0, len(pages), chunk_size)]
+                    next_page = 0
+                    for future in futures:
+                        try:
+                            for page_num, leading_lines, transactions, open_transaction, *seconds in future.result():
+                                extract_skipped(range(next_page, page_num))
+                                transactions = parser.absorb(leading_lines, transactions, open_transaction)
+                                page_results.append((page_num, transactions, *seconds))
+                                next_page = page_num + 1
+                            if progress:
+                                progress(len(page_results), pages_total)
+                            _check_deadline(deadline)
+                        except StatementTooLarge:
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            raise
+                    extract_skipped(range(next_page, page_count))
+            else:
+                # One parser for the whole document so transactions can span pages.
+                # The pages up to the next candidate may continue its last entry.
+                for page_num, next_page in zip(pages, [*pages[1:], page_count]):
+                    _check_deadline(deadline)
+                    transactions, extract_seconds, parse_seconds = _process_page(document, page_num, parser)
+                    page_results.append((page_num, transactions, extract_seconds, parse_seconds))
+                    extract_skipped(range(page_num + 1, next_page))
+                    if progress:
+                        progress(len(page_results), pages_total)
+
+        PAGES_SKIPPED_TOTAL.inc(page_count - len(page_results))
+        logger.info(f"Extracted {len(page_results)} of {page_count} pages")
+
+        # The last transaction is only complete once the document ends
+        if page_results:
+            page_results[-1][1].extend(parser.close())
+
+    except Exception as e:
+        logger.error(f"Error reading PDF: {str(e)}")
+        raise
+
+    all_transactions = []
+    for page_num, transactions, extract_seconds, parse_seconds in page_results:
+        all_transactions.extend(transactions)
+        STAGE_SECONDS.observe(extract_seconds, stage='page_extract')
+        STAGE_SECONDS.observe(parse_seconds, stage='parse')
+        logger.debug(f"Page {page_num + 1} extracted in {extract_seconds * 1000:.1f} ms, "
+                     f"parsed in {parse_seconds * 1000:.1f} ms")
+        if page_timings is not None:
+            page_timings.append({
+                'page': page_num + 1,
+                'seconds': extract_seconds + parse_seconds,
+                'extract_seconds': extract_seconds,
+                'parse_seconds': parse_seconds,
+                'transactions': len(transactions),
+            })
+
+    PAGES_TOTAL.inc(len(page_results))
+    TRANSACTIONS_TOTAL.inc(len(all_transactions))
+
+    logger.info(f"Total transactions found across all pages: {len(all_transactions)}")
+    return all_transactions
+
+
+def transactions_frame(transactions):
+    """Build the DataFrame shared by the summary and detailed report stages.
+
+    Columns are gathered straight from the records: dates are already parsed,
+    so Date becomes datetime64 without string parsing, and Amount is
+    converted from cents once.
+    """
+    return pd.DataFrame({
+        'Date': pd.to_datetime(np.array([t.date for t in transactions], dtype='datetime64[D]')),
+        'Reference': [t.reference for t in transactions],
+        'Name': [t.name for t in transactions],
+        'Account': [t.account for t in transactions],
+        'Amount': np.array([np.nan if t.amount_cents is None else t.amount_cents for t in transactions],
+                           dtype=float) / 100,
+        'Time': [t.time for t in transactions],
+        'Source': [t.source for t in transactions],
+    })
+
+
+def create_monthly_summary(transactions, keys=SUMMARY_KEYS):
+    """Create monthly summary DataFrame from transactions, one row per ``keys`` combination.
+
+    ``transactions`` is a list of Transaction records or the DataFrame from
+    transactions_frame. Amounts are grouped on a monthly Period key and
+    unstacked, so months sort chronologically as periods and are only
+    formatted as 'Month YYYY' labels for the final columns.
+    """
+    if not len(transactions):
+        return pd.DataFrame()
+
+    df = transactions if isinstance(transactions, pd.DataFrame) else transactions_frame(transactions)
+    return _format_summary(_monthly_pivot(df, keys), keys, df[list(keys)].dtypes)
+
+
+def _monthly_pivot(df, keys):
+    """Amount per ``keys`` combination (index) and monthly Period (columns)."""
+    month = df['Date'].dt.to_period('M').rename('Month')
+
+    # Sum per key combination and month; categorical keys keep high-cardinality
+    # Name/Account sets cheap to group, and rows with a missing key are dropped
+    group_keys = [df[key].astype('category') for key in keys] + [month]
+    grouped = df['Amount'].groupby(group_keys, observed=True, sort=True).sum()
+    return grouped.unstack('Month', fill_value=0.0)
+
+
+def _format_summary(pivot_df, keys, key_dtypes):
+    """Turn a _monthly_pivot frame into the summary sheet layout."""
+    # Calculate total over every month column
+    pivot_df['Total'] = pivot_df.sum(axis=1)
+    pivot_df = pivot_df.reset_index()
+    for key in keys:
+        pivot_df[key] = pivot_df[key].astype(key_dtypes[key])
+
+    # Sort first by Name alphabetically, then by Total amount descending
+    pivot_df = pivot_df.sort_values(['Name', 'Total'], ascending=[True, False], kind='stable')
+
+    # Months are already in period order; format the labels for output
+    pivot_df.columns = [col.strftime('%B %Y') if isinstance(col, pd.Period) else col
+                        for col in pivot_df.columns]
+    pivot_df.columns.name = None
+
+    return pivot_df
+
+
+def read_report(workbook_file):
+    """Read a workbook written by build_workbook back as (detailed_df, keys).
+
+    ``detailed_df`` has the transactions_frame columns of the detailed sheet;
+    ``keys`` are the summary keys, with 'Source' for batch reports. Only the
+    detailed sheet is read, as the summary can be summed again from it.
+    Needs openpyxl.
+    """
+    # Keep text cells as written; pandas would otherwise read accounts such as '12345' as numbers
+    text_columns = {col: object for col in ('Reference', 'Name', 'Account', 'Time', 'Source')}
+    detailed_df = pd.read_excel(workbook_file, sheet_name='Detailed Transactions', dtype=text_columns)
+
+    # Batch reports are also summarised by Source
+    keys = SUMMARY_KEYS + ('Source',) if 'Source' in detailed_df.columns else SUMMARY_KEYS
+    return detailed_df, keys
+
+
+def append_to_report(workbook_file, transactions, source=None):
+    """Merge new transactions into a workbook written by build_workbook.
+
+    Transactions whose Reference is already in the workbook are skipped. The
+    workbook's stored state (see read_report_state) already holds its
+    transactions and the summary's monthly totals in cents, so only the new
+    transactions are grouped by month and added to those totals; the sheets
+    are not read back. Workbooks without state (written before it was
+    stored, or re-saved by a spreadsheet application) are read back from
+    their sheets instead. ``source`` fills the Source column of new rows when
+    the workbook is a batch report. Returns (workbook bytes, number of
+    transactions added).
+    """
+    with STAGE_SECONDS.time(stage='pivot'):
+        state = read_report_state(workbook_file)
+        if state is None:
+            logger.info("Workbook has no stored state; reading its sheets")
+            state = _report_state_from_sheets(workbook_file)
+        keys, history, totals = state
+
+        known = {transaction.reference for transaction in history}
+        added = []
+        for transaction in transactions:
+            if transaction.reference in known:
+                continue
+            known.add(transaction.reference)
+            if 'Source' in keys and transaction.source is None:
+                # A copy, so cached transactions are left as they were
+                transaction = replace(transaction, source=source)
+            added.append(transaction)
+        _accumulate_monthly_cents(added, keys, totals)
+        month_keys, summary_rows = _summary_rows(totals)
+
+    with STAGE_SECONDS.time(stage='excel_write'):
+        merged = history + added
+        output = io.BytesIO()
+        _write_rows_streaming(merged, output, keys, month_keys, summary_rows, None)
+        _attach_report_state(output, merged, keys, totals)
+        return output.getvalue(), len(added)
+
+
+# Cell formats shared by the Excel report writers
+REPORT_FORMATS = {
+    'header': {
+        'bold': True,
+        'bg_color': '#D3D3D3',
+        'border': 1,
+        'text_wrap': True,
+        'align': 'center',
+        'valign': 'vcenter'
+    },
+    'money': {
+        'num_format': '#,##0.00',
+        'border': 1,
+        'align': 'right'
+    },
+    'text': {
+        'border': 1,
+        'text_wrap': True
+    },
+    'total': {
+        'bold': True,
+        'num_format': '#,##0.00',
+        'bg_color': '#F0F0F0',
+        'border': 1,
+        'align': 'right'
+    },
+    'date': {
+        'num_format': 'yyyy-mm-dd',
+        'border': 1,
+        'align': 'center'
+    },
+    'time': {
+        'num_format': 'hh:mm:ss',
+        'border': 1,
+        'align': 'center'
+    },
+}
+
+DETAILED_COLUMNS = ['Date', 'Reference', 'Name', 'Account', 'Amount', 'Time']
+DETAILED_WIDTHS = [12, 15, 30, 15, 15, 10]
+
+# How the summary's TOTAL row is written: 'formula' writes SUM formulas with
+# the precomputed totals as their cached results, 'value' writes the totals
+# as plain numbers so there is nothing to recalculate when a large report opens
+SUMMARY_TOTALS = os.environ.get('MPESYNC_SUMMARY_TOTALS', 'formula')
+
+
+def _add_report_formats(workbook):
+    """Register the report cell formats on an xlsxwriter workbook."""
+    return {name: workbook.add_format(spec) for name, spec in REPORT_FORMATS.items()}
+
+
+def _detailed_columns(keys):
+    """Detailed sheet columns, with any extra summary keys (e.g. Source) appended."""
+    return DETAILED_COLUMNS + [key for key in keys if key not in DETAILED_COLUMNS]
+
+
+def _write_total_row(worksheet, total_row, keys, column_totals, formats):
+    """Write the summary's TOTAL row under data rows 1 .. total_row - 1.
+
+    ``column_totals`` are the sums of the amount columns (months, then Total)
+    that follow the ``keys`` columns. Cells are addressed with xlsxwriter's A1
+    helpers, so summaries of any width get valid references.
+    """
+    worksheet.write(total_row, 0, 'TOTAL', formats['total'])
+    for col_num in range(1, len(keys)):
+        worksheet.write(total_row, col_num, '', formats['total'])
+
+    for col_num, total in enumerate(column_totals, start=len(keys)):
+        if SUMMARY_TOTALS == 'value':
+            worksheet.write_number(total_row, col_num, total, formats['total'])
+        else:
+            cells = xl_range(1, col_num, total_row - 1, col_num)
+            worksheet.write_formula(total_row, col_num, f'=SUM({cells})', formats['total'], total)
+
+
+def build_workbook(transactions, keys=SUMMARY_KEYS):
+    """Build the formatted Excel report for a list of transactions and return its bytes."""
+    # Create monthly summary from the one DataFrame both sheets share
+    with STAGE_SECONDS.time(stage='pivot'):
+        df = transactions_frame(transactions)
+        monthly_summary = create_monthly_summary(df, keys)
+
+    with STAGE_SECONDS.time(stage='excel_write'):
+        output = io.BytesIO(_write_workbook(df, monthly_summary, keys))
+        _attach_report_state(output, transactions, keys, _accumulate_monthly_cents(transactions, keys, {}))
+        return output.getvalue()
+
+
+def _write_workbook(df, monthly_summary, keys):
+    """Write the summary and detailed sheets with pandas/xlsxwriter and return the bytes."""
+    detailed_columns = _detailed_columns(keys)
+
+    # Sort by date, keeping same-day rows in statement order as the streaming writer does
+    detailed_df = df.sort_values('Date', kind='stable')[detailed_columns]
+
+    # Create Excel file in memory
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        # Write monthly summary
+        monthly_summary.to_excel(writer, sheet_name='Monthly Summary', index=False)
+
+        # Write detailed transactions
+        detailed_df.to_excel(writer, sheet_name='Detailed Transactions', index=False)
+
+        workbook = writer.book
+
+        # Format Monthly Summary sheet
+        summary_worksheet = writer.sheets['Monthly Summary']
+
+        # Add formats
+        formats = _add_report_formats(workbook)
+        header_format = formats['header']
+        money_format = formats['money']
+        text_format = formats['text']
+
+        # Apply formats to Monthly Summary
+        for col_num, value in enumerate(monthly_summary.columns.values):
+            summary_worksheet.write(0, col_num, value, header_format)
+
+            # Set column formats and widths
+            if col_num < len(keys):  # Name, Account (and Source) columns
+                summary_worksheet.set_column(col_num, col_num, 30, text_format)
+            else:  # Amount columns
+                summary_worksheet.set_column(col_num, col_num, 15, money_format)
+
+        # Add totals row
+        column_totals = monthly_summary.iloc[:, len(keys):].sum().tolist()
+        _write_total_row(summary_worksheet, len(monthly_summary) + 1, keys, column_totals, formats)
+
+        # Format Detailed Transactions sheet
+        detailed_worksheet = writer.sheets['Detailed Transactions']
+
+        # Set formats for detailed transactions
+        date_format = formats['date']
+        time_format = formats['time']
+
+        # Set column widths and formats
+        detailed_worksheet.set_column('A:A', 12, date_format)  # Date
+        detailed_worksheet.set_column('B:B', 15, text_format)  # Reference
+        detailed_worksheet.set_column('C:C', 30, text_format)  # Name
+        detailed_worksheet.set_column('D:D', 15, text_format)  # Account
+        detailed_worksheet.set_column('E:E', 15, money_format)  # Amount
+        detailed_worksheet.set_column('F:F', 10, time_format)  # Time
+        if len(detailed_columns) > len(DETAILED_COLUMNS):
+            detailed_worksheet.set_column(len(DETAILED_COLUMNS), len(detailed_columns) - 1, 30, text_format)
+
+        # Apply header format
+        for col_num, value in enumerate(detailed_df.columns.values):
+            detailed_worksheet.write(0, col_num, value, header_format)
+
+    return output.getvalue()
+
+
+def _accumulate_monthly_cents(transactions, keys, totals):
+    """Add each transaction's amount to ``totals[key_values][(year, month)]`` in cents; returns ``totals``."""
+    for transaction in transactions:
+        key_values = tuple(transaction.field(key) for key in keys)
+        if None in key_values:
+            continue
+        month_key = (transaction.date.year, transaction.date.month)
+        by_month = totals.setdefault(key_values, {})
+        by_month[month_key] = by_month.get(month_key, 0) + (transaction.amount_cents or 0)
+    return totals
+
+
+def _summary_rows(totals):
+    """Summary rows for totals from _accumulate_monthly_cents, without building DataFrames.
+
+    Returns (month_keys, rows) where month_keys are sorted (year, month) tuples and
+    rows are (key_values, {month_key: amount}, total) sorted like the summary.
+    """
+    months = set()
+    rows = []
+    for key_values, by_month in totals.items():
+        months.update(by_month)
+        by_month = {month_key: cents / 100 for month_key, cents in by_month.items()}
+        rows.append((key_values, by_month, sum(by_month.values())))
+    # Sort first by Name alphabetically, then by Total amount descending
+    rows.sort(key=lambda row: -row[2])
+    rows.sort(key=lambda row: row[0][0])
+    return sorted(months), rows
+
+
+def write_workbook_streaming(transactions, output, keys=SUMMARY_KEYS, tmpdir=None):
+    """Write the Excel report row by row in xlsxwriter's constant_memory mode.
+
+    ``output`` is a path or binary file object. Rows are written straight from
+    the transaction list and flushed to disk as they go, so apart from the
+    (small) Name/Account x month totals the writer holds a single row in memory
+    regardless of statement size. Produces the same sheets and formatting as
+    build_workbook; the append state is only stored when ``output`` is a path
+    or a file opened for reading and writing.
+    """
+    with STAGE_SECONDS.time(stage='pivot'):
+        totals = _accumulate_monthly_cents(transactions, keys, {})
+        month_keys, summary_rows = _summary_rows(totals)
+
+    with STAGE_SECONDS.time(stage='excel_write'):
+        _write_rows_streaming(transactions, output, keys, month_keys, summary_rows, tmpdir)
+        _attach_report_state(output, transactions, keys, totals, tmpdir)
+
+
+def _write_rows_streaming(transactions, output, keys, month_keys, summary_rows, tmpdir):
+    """Write both sheets for write_workbook_streaming from precomputed monthly totals."""
+    detailed_columns = _detailed_columns(keys)
+    month_labels = [date(year, month, 1).strftime('%B %Y') for year, month in month_keys]
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'tmpdir': tmpdir})
+    try:
+        formats = _add_report_formats(workbook)
+
+        # Monthly Summary sheet
+        summary_worksheet = workbook.add_worksheet('Monthly Summary')
+        headers = list(keys) + month_labels + ['Total']
+        summary_worksheet.set_column(0, len(keys) - 1, 30, formats['text'])
+        summary_worksheet.set_column(len(keys), len(headers) - 1, 15, formats['money'])
+        summary_worksheet.write_row(0, 0, headers, formats['header'])
+
+        column_totals = [0.0] * (len(month_keys) + 1)
+        for row_num, (key_values, by_month, total) in enumerate(summary_rows, start=1):
+            for col_num, value in enumerate(key_values):
+                summary_worksheet.write_string(row_num, col_num, value)
+            for col_num, month_key in enumerate(month_keys, start=len(keys)):
+                amount = by_month.get(month_key, 0.0)
+                summary_worksheet.write_number(row_num, col_num, amount)
+                column_totals[col_num - len(keys)] += amount
+            summary_worksheet.write_number(row_num, len(headers) - 1, total)
+            column_totals[-1] += total
+
+        _write_total_row(summary_worksheet, len(summary_rows) + 1, keys, column_totals, formats)
+
+        # Detailed Transactions sheet, sorted by date
+        detailed_worksheet = workbook.add_worksheet('Detailed Transactions')
+        column_formats = [formats['date'], formats['text'], formats['text'], formats['text'],
+                          formats['money'], formats['time']]
+        for col_num, (width, cell_format) in enumerate(zip(DETAILED_WIDTHS, column_formats)):
+            detailed_worksheet.set_column(col_num, col_num, width, cell_format)
+        if len(detailed_columns) > len(DETAILED_COLUMNS):
+            detailed_worksheet.set_column(len(DETAILED_COLUMNS), len(detailed_columns) - 1, 30, formats['text'])
+        detailed_worksheet.write_row(0, 0, detailed_columns, formats['header'])
+
+        ordered = sorted(transactions, key=lambda transaction: transaction.date)
+        for row_num, transaction in enumerate(ordered, start=1):
+            detailed_worksheet.write_datetime(row_num, 0, transaction.date, formats['date'])
+            for col_num, col in enumerate(detailed_columns[1:], start=1):
+                value = transaction.field(col)
+                if value is not None:
+                    detailed_worksheet.write(row_num, col_num, value)
+    finally:
+        workbook.close()
+
+
+# Part of the xlsx package holding the state append_to_report merges into:
+# the report's transactions and the summary's monthly totals in cents. No
+# relationship points to it, so spreadsheet applications ignore it (and drop
+# it when they re-save the file, which sends appends back to the sheets).
+# After the opening tags come a line of JSON with the keys and the number of
+# totals lines, a line per key combination with its monthly totals, and a
+# line per transaction, each XML-escaped, so the part is written and read a
+# row at a time.
+REPORT_STATE = os.environ.get('MPESYNC_REPORT_STATE', '1') != '0'
+REPORT_STATE_PART = 'mpesync/state.xml'
+REPORT_STATE_VERSION = 2
+_STATE_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<mpesyncState xmlns="urn:mpesync:report-state">\n'
+_STATE_CLOSE = '</mpesyncState>'
+
+
+def _state_line(value):
+    return (escape(json.dumps(value, separators=(',', ':'))) + '\n').encode('utf-8')
+
+
+def _attach_report_state(output, transactions, keys, totals, tmpdir=None):
+    """Add the append state to a finished workbook (a path or a readable, seekable binary file).
+
+    The part is written a row at a time to a temporary file in ``tmpdir`` and
+    compressed into the workbook from there, so memory does not grow with
+    the number of transactions.
+    """
+    if not REPORT_STATE:
+        return
+    if hasattr(output, 'readable') and not output.readable():
+        logger.debug("Workbook output is write-only; not storing its append state")
+        return
+
+    with tempfile.TemporaryFile(dir=tmpdir) as state:
+        state.write(_STATE_OPEN.encode('utf-8'))
+        state.write(_state_line({'version': REPORT_STATE_VERSION, 'keys': list(keys), 'totals': len(totals)}))
+        for key_values, by_month in totals.items():
+            state.write(_state_line([list(key_values),
+                                     [[year, month, cents] for (year, month), cents in by_month.items()]]))
+        for t in transactions:
+            state.write(_state_line([t.reference, t.date.toordinal(), t.time, t.amount_cents, t.name, t.account,
+                                     t.source]))
+        state.write(_STATE_CLOSE.encode('utf-8'))
+        state.seek(0)
+
+        if hasattr(output, 'seek'):
+            output.seek(0)
+        with zipfile.ZipFile(output, 'a', compression=zipfile.ZIP_DEFLATED) as package:
+            with package.open(REPORT_STATE_PART, 'w', force_zip64=True) as part:
+                shutil.copyfileobj(state, part)
+
+
+def read_report_state(workbook_file):
+    """Read the append state stored in a workbook by build_workbook or write_workbook_streaming.
+
+    Returns (keys, transactions, totals), where ``totals`` maps key values to
+    {(year, month): cents}, or None when the workbook holds no state.
+    """
+    try:
+        with zipfile.ZipFile(workbook_file) as package:
+            try:
+                part = package.open(REPORT_STATE_PART)
+            except KeyError:
+                return None
+            with io.TextIOWrapper(part, encoding='utf-8') as lines:
+                opening = next(lines, '') + next(lines, '')
+                if opening != _STATE_OPEN:
+                    return None
+                header = json.loads(unescape(next(lines)))
+                if header.get('version') != REPORT_STATE_VERSION:
+                    return None
+
+                totals = {}
+                for _ in range(header['totals']):
+                    key_values, by_month = json.loads(unescape(next(lines)))
+                    totals[tuple(key_values)] = {(year, month): cents for year, month, cents in by_month}
+                transactions = []
+                for line in lines:
+                    if line == _STATE_CLOSE:
+                        break
+                    reference, ordinal, time_text, cents, name, account, source = json.loads(unescape(line))
+                    transactions.append(Transaction(
+                        reference, date.fromordinal(ordinal), time_text, cents,
+                        None if name is None else sys.intern(name),
+                        None if account is None else sys.intern(account), source))
+    finally:
+        if hasattr(workbook_file, 'seek'):
+            workbook_file.seek(0)
+
+    return tuple(header['keys']), transactions, totals
+
+
+def _report_state_from_sheets(workbook_file):
+    """(keys, transactions, totals) rebuilt from the sheets of a workbook without stored state."""
+    detailed_df, keys = read_report(workbook_file)
+    detailed_df = detailed_df.astype(object).where(detailed_df.notna(), None)
+    transactions = [
+        Transaction(row['Reference'], row['Date'].date(), row['Time'],
+                    None if row['Amount'] is None else round(row['Amount'] * 100),
+                    row['Name'], row['Account'], row.get('Source'))
+        for row in detailed_df.to_dict('records')
+    ]
+    return keys, transactions, _accumulate_monthly_cents(transactions, keys, {})
+
+
+# Output formats of export_transactions, by file extension
+EXPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+def export_transactions(transactions, output, output_format='xlsx', keys=SUMMARY_KEYS):
+    """Write transactions to ``output`` (a path or binary file object) in one of EXPORT_FORMATS.
+
+    'xlsx' is the full report, written with the constant-memory writer from
+    ``STREAMING_MIN_TRANSACTIONS`` transactions. 'csv' and 'parquet' hold the
+    detailed transactions sorted by date; Parquet needs pyarrow.
+    """
+    if output_format == 'xlsx':
+        if len(transactions) >= STREAMING_MIN_TRANSACTIONS:
+            write_workbook_streaming(transactions, output, keys)
+            return
+        workbook_bytes = build_workbook(transactions, keys)
+        if hasattr(output, 'write'):
+            output.write(workbook_bytes)
+        else:
+            with open(output, 'wb') as f:
+                f.write(workbook_bytes)
+        return
+
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+    df = transactions_frame(transactions).sort_values('Date', kind='stable')[_detailed_columns(keys)]
+    if output_format == 'csv':
+        df.to_csv(output, index=False, date_format='%Y-%m-%d')
+    else:
+        df.to_parquet(output, index=False)
+
+
+def _process_batch_file(path, backend):
+    """Pool task: parse one statement of a batch (pages serially within the task)."""
+    return process_pdf(path, workers=0, backend=backend)
+
+
+def process_statement_batch(sources, workers=None, backend=None, failures=None):
+    """Parse many statements concurrently and merge them into one transaction list.
+
+    ``sources`` is an iterable of (source_name, pdf_path). Transactions are tagged
+    with their ``Source`` and deduplicated by ``Reference`` across statements
+    with overlapping periods; the first statement (in input order) that lists a
+    reference wins. At most ``2 * workers`` statements are in flight at once and
+    only the merged, deduplicated transactions are kept, so memory follows the
+    number of unique transactions rather than the number of files.
+
+    A statement that fails to parse (corrupt, or over a MAX_PDF_* budget) is
+    skipped and the rest of the batch is still merged; if ``failures`` is a
+    list, (source_name, error message) is appended to it for each one.
+    """
+    if workers is None:
+        workers = BATCH_WORKERS
+    merged = {}
+    duplicates = 0
+
+    def merge(source_name, future):
+        nonlocal duplicates
+        try:
+            transactions = future.result()
+        except Exception as e:
+            logger.warning(f"Skipping {source_name} in batch: {str(e)}")
+            if failures is not None:
+                failures.append((source_name, str(e)))
+            return
+        for transaction in transactions:
+            if transaction.reference in merged:
+                duplicates += 1
+                continue
+            transaction.source = source_name
+            merged[transaction.reference] = transaction
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context) as executor:
+        in_flight = deque()
+        for source_name, path in sources:
+            in_flight.append((source_name, executor.submit(_process_batch_file, path, backend)))
+            # Merge in submission order so deduplication is deterministic
+            while len(in_flight) >= 2 * workers:
+                name, future = in_flight.popleft()
+                merge(name, future)
+        while in_flight:
+            name, future = in_flight.popleft()
+            merge(name, future)
+
+    logger.info(f"Batch merged {len(merged)} unique transactions, dropped {duplicates} duplicates")
+    return list(merged.values())
@@ -0,0 +1,337 @@
+"""PDF extraction backends shared by both converters.
+
+Every backend opens a document from bytes and exposes the same interface:
+
+    with open_pdf(pdf_bytes, 'pypdfium2') as document:
+        document.page_count
+        document.page_text(page_num)
+        document.page_content(page_num)  # raw content stream, or None
+        document.page_table(page_num)  # pdfplumber only
+        document.page_words(page_num)  # pypdfium2 only
+
+Available backends, fastest first:
+
+- ``pypdfium2``: PDFium text extraction (optional, ``pip install pypdfium2``);
+  also gives positioned words, which the table converter splits into cells.
+  PDFium is not thread-safe, so its calls are serialised by a module lock
+- ``pypdf2``: PyPDF2 ``extract_text`` (the original app.py extractor)
+- ``pdfminer``: pdfminer.six with LAParams tuned for line-per-row statements
+- ``pdfplumber``: pdfplumber text and ``extract_table`` (the original table
+  converter extractor; the only backend that extracts ruled table cells)
+
+Backends whose library is not installed are skipped by ``available_backends``.
+"""
+import ctypes
+import importlib.util
+import io
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PdfDocument:
+    """An open PDF. Subclasses implement page_text and, optionally, page_table or page_words."""
+
+    supports_tables = False
+    supports_words = False
+
+    def __init__(self, page_count):
+        self.page_count = page_count
+
+    def page_text(self, page_num):
+        raise NotImplementedError
+
+    def page_content(self, page_num):
+        """The page's decoded content stream, or None if the backend cannot read it cheaply.
+
+        This is the raw drawing program, without any text extraction, so it is
+        only good for quick checks before deciding to extract a page.
+        """
+        return None
+
+    def page_table(self, page_num):
+        raise NotImplementedError(f"{type(self).__name__} cannot extract tables")
+
+    def page_words(self, page_num):
+        raise NotImplementedError(f"{type(self).__name__} cannot extract positioned words")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PyPDF2Document(PdfDocument):
+    def __init__(self, pdf_bytes):
+        import PyPDF2
+
+        self._reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        super().__init__(len(self._reader.pages))
+
+    def page_text(self, page_num):
+        return self._reader.pages[page_num].extract_text()
+
+    def page_content(self, page_num):
+        contents = self._reader.pages[page_num].get_contents()
+        if contents is None:
+            return b''
+        if isinstance(contents, list):  # an array of content streams
+            return b'\n'.join(stream.get_object().get_data() for stream in contents)
+        return contents.get_data()
+
+
+class PdfplumberDocument(PdfDocument):
+    supports_tables = True
+
+    def __init__(self, pdf_bytes):
+        import pdfplumber
+
+        self._pdf = pdfplumber.open(io.BytesIO(pdf_bytes))
+        super().__init__(len(self._pdf.pages))
+
+    @property
+    def pages(self):
+        """The underlying pdfplumber pages, for callers that need layout access."""
+        return self._pdf.pages
+
+    def page_text(self, page_num):
+        return self._pdf.pages[page_num].extract_text() or ''
+
+    def page_content(self, page_num):
+        return _pdfminer_content(self._pdf.pages[page_num].page_obj)
+
+    def page_table(self, page_num, table_settings=None):
+        """The page's largest table as a list of rows, or None.
+
+        With the default 'lines' strategies the page is first cropped to its
+        ruling lines, so table finding and text extraction only cover the
+        table region, and pages without ruling lines are skipped outright.
+        """
+        page = self._pdf.pages[page_num]
+        settings = table_settings or {}
+        try:
+            if settings.get('vertical_strategy', 'lines') == 'lines' and \
+                    settings.get('horizontal_strategy', 'lines') == 'lines':
+                edges = page.edges
+                if not edges:
+                    return None
+                x0, top, x1, bottom = page.bbox
+                bbox = (max(x0, min(edge['x0'] for edge in edges) - 1),
+                        max(top, min(edge['top'] for edge in edges) - 1),
+                        min(x1, max(edge['x1'] for edge in edges) + 1),
+                        min(bottom, max(edge['bottom'] for edge in edges) + 1))
+                return page.crop(bbox).extract_table(settings)
+            return page.extract_table(settings)
+        finally:
+            # Drop the page's parsed layout objects so memory stays per-page
+            page.flush_cache()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdfminerDocument(PdfDocument):
+    # Statements are one row per line: keep lines apart (small line_margin)
+    # and skip the expensive reading-order analysis (boxes_flow=None)
+    LAPARAMS = dict(line_margin=0.2, char_margin=2.0, word_margin=0.1, boxes_flow=None)
+
+    def __init__(self, pdf_bytes):
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        self._laparams = LAParams(**self.LAPARAMS)
+        self._document = PDFDocument(PDFParser(io.BytesIO(pdf_bytes)))
+        self._pages = list(PDFPage.create_pages(self._document))
+        super().__init__(len(self._pages))
+
+    def page_text(self, page_num):
+        from pdfminer.converter import TextConverter
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+        output = io.StringIO()
+        resources = PDFResourceManager(caching=True)
+        device = TextConverter(resources, output, laparams=self._laparams)
+        try:
+            PDFPageInterpreter(resources, device).process_page(self._pages[page_num])
+        finally:
+            device.close()
+        return output.getvalue()
+
+    def page_content(self, page_num):
+        return _pdfminer_content(self._pages[page_num])
+
+
+def _pdfminer_content(page):
+    """Decoded content streams of a pdfminer PDFPage."""
+    from pdfminer.pdftypes import resolve1
+
+    return b'\n'.join(resolve1(stream).get_data() for stream in page.contents)
+
+
+# PDFium is not thread-safe, and the servers run conversions on threads:
+# every PDFium call, across all documents, goes through this lock
+_PDFIUM_LOCK = threading.Lock()
+
+
+class PdfiumDocument(PdfDocument):
+    supports_words = True
+
+    # Characters further apart than this (in points) start a new word, as
+    # pdfplumber's default x_tolerance separates words within a cell
+    WORD_GAP = 3
+    # Characters whose baselines differ by more than this are on different lines
+    LINE_TOLERANCE = 1
+
+    def __init__(self, pdf_bytes):
+        import pypdfium2
+
+        with _PDFIUM_LOCK:
+            self._pdf = pypdfium2.PdfDocument(pdf_bytes)
+            page_count = len(self._pdf)
+        super().__init__(page_count)
+
+    def page_text(self, page_num):
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_num]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    return textpage.get_text_range().replace('\r\n', '\n')
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+
+    def page_words(self, page_num):
+        """Words in the page's ruled area as (x0, x1, baseline, text), or None.
+
+        Like PdfplumberDocument.page_table, only the bounding box of the
+        page's lines and other path objects is read, and pages without any
+        are skipped (None). Words break at whitespace and at gaps wider than
+        WORD_GAP. Coordinates are PDF points, with baselines measured up
+        from the bottom of the page.
+        """
+        import pypdfium2.raw as pdfium_c
+
+        with _PDFIUM_LOCK:
+            page = self._pdf[page_num]
+            try:
+                paths = [path.get_bounds()
+                         for path in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=1)]
+                if not paths:
+                    return None
+                # Clipped to the page, as text drawn off the page is not shown
+                page_left, page_bottom, page_right, page_top = page.get_bbox()
+                left = max(page_left, min(bounds[0] for bounds in paths) - 1)
+                bottom = max(page_bottom, min(bounds[1] for bounds in paths) - 1)
+                right = min(page_right, max(bounds[2] for bounds in paths) + 1)
+                top = min(page_top, max(bounds[3] for bounds in paths) + 1)
+
+                textpage = page.get_textpage()
+                try:
+                    return self._words(textpage, pdfium_c, (left, bottom, right, top))
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+
+    def _words(self, textpage, pdfium_c, area):
+        left, bottom, right, top = area
+        origin_x, origin_y = ctypes.c_double(), ctypes.c_double()
+        words = []
+        word = None  # [x0, x1, baseline, chars] of the word being read
+        for index in range(textpage.count_chars()):
+            char = chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, index))
+            inside = False
+            if not char.isspace():
+                pdfium_c.FPDFText_GetCharOrigin(textpage.raw, index, origin_x, origin_y)
+                inside = left <= origin_x.value <= right and bottom <= origin_y.value <= top
+            if not inside:
+                # Whitespace, or text outside the ruled area, ends the word
+                word = None
+                continue
+
+            x0, _, x1, _ = textpage.get_charbox(index)
+            baseline = origin_y.value
+            if word is None or abs(baseline - word[2]) > self.LINE_TOLERANCE or x0 - word[1] > self.WORD_GAP:
+                word = [x0, x1, baseline, []]
+                words.append(word)
+            word[1] = max(word[1], x1)
+            word[3].append(char)
+        return [(x0, x1, baseline, ''.join(chars)) for x0, x1, baseline, chars in words]
+
+    def close(self):
+        with _PDFIUM_LOCK:
+            self._pdf.close()
+
+
+# Backend name -> (document class, module it needs), fastest first
+BACKENDS = {
+    'pypdfium2': (PdfiumDocument, 'pypdfium2'),
+    'pypdf2': (PyPDF2Document, 'PyPDF2'),
+    'pdfminer': (PdfminerDocument, 'pdfminer'),
+    'pdfplumber': (PdfplumberDocument, 'pdfplumber'),
+}
+
+
+def available_backends(tables=False):
+    """Names of the installed backends, fastest first.
+
+    With ``tables``, only backends the table converter can read: those that
+    extract tables, or positioned words it splits into cells.
+    """
+    names = []
+    for name, (document_class, module) in BACKENDS.items():
+        if tables and not (document_class.supports_tables or document_class.supports_words):
+            continue
+        if importlib.util.find_spec(module) is not None:
+            names.append(name)
+    return names
+
+
+def open_pdf(pdf_bytes, backend):
+    """Open ``pdf_bytes`` with the named backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    document_class, _ = BACKENDS[backend]
+    return document_class(pdf_bytes)
+
+
+def backends_faster_than(reference, tables=False):
+    """Installed backends ranked ahead of ``reference`` by available_backends."""
+    names = available_backends(tables=tables)
+    return names[:names.index(reference)] if reference in names else names
+
+
+def _probe_texts(document, page_nums):
+    return [document.page_text(page_num) for page_num in page_nums]
+
+
+def select_backend(pdf_bytes, accept, candidates=None, probe_pages=3, read=_probe_texts):
+    """Pick the first of ``candidates`` whose output ``accept`` approves on a few probe pages.
+
+    ``read(document, page_nums)`` reads the first ``probe_pages`` pages (their
+    text by default) and ``accept(backend, probe)`` receives the backend name
+    and what was read, returning True when the backend reads them accurately.
+    Candidates default to every installed backend, fastest first. Backends
+    that fail to open or read are skipped. Returns None when no candidate is
+    accepted.
+    """
+    for name in available_backends() if candidates is None else candidates:
+        try:
+            with open_pdf(pdf_bytes, name) as document:
+                probe = read(document, range(min(probe_pages, document.page_count)))
+        except Exception as e:
+            logger.warning(f"PDF backend {name} failed on probe: {str(e)}")
+            continue
+        if accept(name, probe):
+            logger.info(f"Selected PDF backend {name}")
+            return name
+    return None
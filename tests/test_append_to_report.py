@@ -0,0 +1,85 @@
+"""append_to_report merging against the state stored in the workbook, and against its sheets."""
+import io
+import logging
+from datetime import date, timedelta
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import mpesync
+from mpesync import Transaction
+
+logging.disable(logging.INFO)
+
+NAMES = ['ALICE WANJIRU', 'BRIAN OTIENO', 'CAROL AKINYI']
+
+
+def transactions_from(first, count):
+    """``count`` transactions with references from ``first``, spread over two years."""
+    return [Transaction(f'R{n:07d}', date(2023, 1, 1) + timedelta(days=(n * 37) % 730), '09:30:00',
+                        (n * 7919) % 200_000 - 100_000, NAMES[n % len(NAMES)], f'07{n % 5:08d}')
+            for n in range(first, first + count)]
+
+
+def sheets(workbook_bytes):
+    """Both sheets, the detailed one ordered by Reference."""
+    frames = pd.read_excel(io.BytesIO(workbook_bytes), sheet_name=None, dtype=object)
+    detailed = frames['Detailed Transactions']
+    frames['Detailed Transactions'] = detailed.sort_values('Reference').reset_index(drop=True)
+    return frames
+
+
+def assert_same_report(actual, expected):
+    actual, expected = sheets(actual), sheets(expected)
+    pd.testing.assert_frame_equal(actual['Detailed Transactions'], expected['Detailed Transactions'])
+    # Totals are summed in a different order, so compare them as numbers
+    pd.testing.assert_frame_equal(actual['Monthly Summary'], expected['Monthly Summary'], check_dtype=False,
+                                  check_exact=False)
+
+
+@pytest.fixture
+def old():
+    return transactions_from(0, 300)
+
+
+@pytest.fixture
+def new(old):
+    # Overlaps the old report, as consecutive statements do
+    return transactions_from(250, 100)
+
+
+def test_workbooks_store_their_state(old):
+    keys, transactions, totals = mpesync.read_report_state(io.BytesIO(mpesync.build_workbook(old)))
+    assert keys == mpesync.SUMMARY_KEYS
+    assert transactions == old
+    assert totals == mpesync._accumulate_monthly_cents(old, keys, {})
+
+
+def test_streaming_workbook_stores_its_state(tmp_path, old):
+    path = tmp_path / 'report.xlsx'
+    with open(path, 'w+b') as f:
+        mpesync.write_workbook_streaming(old, f)
+    assert mpesync.read_report_state(str(path))[1] == old
+
+
+def test_append_matches_rebuild(old, new):
+    workbook_bytes, added = mpesync.append_to_report(io.BytesIO(mpesync.build_workbook(old)), new)
+    assert added == 50
+    assert_same_report(workbook_bytes, mpesync.build_workbook(transactions_from(0, 350)))
+
+    # The appended workbook carries the merged state for the next append
+    workbook_bytes, added = mpesync.append_to_report(io.BytesIO(workbook_bytes), transactions_from(340, 20))
+    assert added == 10
+    assert_same_report(workbook_bytes, mpesync.build_workbook(transactions_from(0, 360)))
+
+
+def test_append_without_state_reads_the_sheets(old, new):
+    # Saving the workbook again (as a spreadsheet application would) drops the state
+    resaved = io.BytesIO()
+    openpyxl.load_workbook(io.BytesIO(mpesync.build_workbook(old))).save(resaved)
+    assert mpesync.read_report_state(io.BytesIO(resaved.getvalue())) is None
+
+    workbook_bytes, added = mpesync.append_to_report(io.BytesIO(resaved.getvalue()), new)
+    assert added == 50
+    assert_same_report(workbook_bytes, mpesync.build_workbook(transactions_from(0, 350)))
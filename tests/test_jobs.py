@@ -0,0 +1,140 @@
+"""Background conversion jobs served by app.py."""
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+import mpesync
+from benchmarks.synthetic import generate_statement_pdf
+from jobs import JobManager
+
+pytest.importorskip('flask')
+import app as web_app  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.fixture
+def client(job_dir, monkeypatch):
+    manager = JobManager(job_dir)
+    monkeypatch.setattr(web_app, 'job_manager', manager)
+    yield web_app.app.test_client()
+    manager.shutdown()
+
+
+def write_result(job, text):
+    path = os.path.join(os.path.dirname(job.state_path), f'{job.id}.txt')
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def wait_until_finished(manager, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.finished_at is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_any_manager_sharing_the_directory_serves_a_job(job_dir):
+    # As two gunicorn workers would
+    runner, other = JobManager(job_dir), JobManager(job_dir)
+    started = threading.Event()
+    release = threading.Event()
+
+    def convert(job, text):
+        job.set_progress(1, 2)
+        started.set()
+        release.wait(10)
+        return write_result(job, text)
+
+    job = runner.submit(convert, 'workbook')
+    started.wait(10)
+    assert (other.get(job.id).status, other.get(job.id).pages_done) == ('running', 1)
+    assert (runner.pending(), other.pending()) == (1, 0)
+
+    release.set()
+    finished = wait_until_finished(other, job.id)
+    assert finished.status == 'done'
+    with open(finished.result_path) as f:
+        assert f.read() == 'workbook'
+    assert other.get('../' + job.id) is None
+
+
+def test_expired_jobs_are_removed_by_any_manager(job_dir):
+    runner = JobManager(job_dir, ttl=60)
+    job = wait_until_finished(runner, runner.submit(write_result, 'workbook').id)
+    # A result left behind by a worker that died mid-job
+    orphan = os.path.join(job_dir, 'mpesync-job-orphan.xlsx')
+    open(orphan, 'w').close()
+
+    other = JobManager(job_dir, ttl=60)
+    other.submit(write_result, 'next')
+    assert os.path.exists(job.result_path) and os.path.exists(orphan)
+
+    past = time.time() - 120
+    os.utime(orphan, (past, past))
+    os.utime(job.result_path, (past, past))
+    with open(job.state_path) as f:
+        state = json.load(f)
+    state['finished_at'] = past
+    with open(job.state_path, 'w') as f:
+        json.dump(state, f)
+
+    assert other.get(job.id) is None
+    other.submit(write_result, 'last')
+    assert not any(os.path.exists(path) for path in (job.state_path, job.result_path, orphan))
+
+
+def test_shutdown_fails_unfinished_jobs(job_dir):
+    runner = JobManager(job_dir, max_workers=1)
+    release = threading.Event()
+    running = runner.submit(lambda job: release.wait(10) and write_result(job, 'late'))
+    queued = runner.submit(write_result, 'never')
+    runner.shutdown()
+    release.set()
+
+    other = JobManager(job_dir)
+    for job in (running, queued):
+        assert other.get(job.id).status == 'failed'
+    assert runner.pending() == 0
+
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/jobs/{job_id}').get_json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def submit(client, pdf_bytes):
+    response = client.post('/jobs', data={'pdf_file': (io.BytesIO(pdf_bytes), 'statement.pdf')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    return response.get_json()['id']
+
+
+def test_statement_over_the_limits_is_rejected_with_413(client, monkeypatch):
+    monkeypatch.setattr(mpesync, 'MAX_PDF_PAGES', 2)
+    job_id = submit(client, generate_statement_pdf(pages=3))
+
+    status = wait_for(client, job_id)
+    assert (status['status'], status['error_status']) == ('failed', 413)
+    response = client.get(f'/jobs/{job_id}/result')
+    assert response.status_code == 413
+    assert b'more than the limit' in response.data
@@ -0,0 +1,65 @@
+"""The content-stream page filter: which pages are extracted, and that it never changes the transactions."""
+import io
+import logging
+
+import pytest
+
+import mpesync
+from benchmarks.synthetic import (DISCLAIMER_LINES, _text_at, build_pdf, entry_text_lines, generate_entries,
+                                  generate_statement_pdf)
+from pdf_backends import available_backends
+
+logging.disable(logging.INFO)
+
+BACKENDS = [name for name in ('pypdf2', 'pypdfium2') if name in available_backends()]
+
+
+def text_page(lines):
+    return ' '.join(_text_at(30, 810 - 10 * i, line) for i, line in enumerate(lines))
+
+
+def extracted_pages(pdf_bytes, backend, page_filter, monkeypatch, workers=0):
+    """(transactions, extracted page numbers) of a statement."""
+    monkeypatch.setattr(mpesync, 'PAGE_FILTER', page_filter)
+    timings = []
+    transactions = mpesync.process_pdf(io.BytesIO(pdf_bytes), workers=workers, backend=backend,
+                                       page_timings=timings)
+    return transactions, sorted(timing['page'] for timing in timings)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_cover_and_disclaimer_are_skipped(backend, monkeypatch):
+    pdf_bytes = generate_statement_pdf(pages=4)
+    transactions, pages = extracted_pages(pdf_bytes, backend, True, monkeypatch)
+    assert pages == [2, 3, 4, 5]
+    assert transactions == extracted_pages(pdf_bytes, backend, False, monkeypatch)[0]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('workers', [0, 2])
+def test_page_with_the_rest_of_an_entry_is_extracted(backend, workers, monkeypatch):
+    monkeypatch.setattr(mpesync, 'PARALLEL_MIN_PAGES', 1)
+    entries = list(generate_entries(6))
+    lines = [line for entry in entries for line in entry_text_lines(entry)]
+    # The last entry's account and amount lines, which carry no date, spill onto a page of their own
+    pdf_bytes = build_pdf([text_page(lines[:12]), text_page(lines[12:-2]), text_page(lines[-2:]),
+                           text_page(DISCLAIMER_LINES)])
+
+    transactions, pages = extracted_pages(pdf_bytes, backend, True, monkeypatch, workers)
+    assert pages == [1, 2, 3]
+    assert transactions == extracted_pages(pdf_bytes, backend, False, monkeypatch, workers)[0]
+    assert transactions[-1].amount_cents == round(entries[-1]['amount'] * 100)
+    assert transactions[-1].account == entries[-1]['account']
+
+
+def test_continuation_pages_stop_once_the_entry_is_complete():
+    entry_lines = entry_text_lines(next(generate_entries(1)))
+    parser = mpesync.TransactionParser(statement_format=mpesync.CUSTOMER_FORMAT)
+    assert list(mpesync._continuation_pages(parser, [3, 4])) == []
+
+    parser.feed('\n'.join(entry_lines[:2]))
+    assert parser.entry_incomplete()
+    continuation = mpesync._continuation_pages(parser, [3, 4])
+    assert next(continuation) == 3
+    parser.feed('\n'.join(entry_lines[2:]))
+    assert list(continuation) == []
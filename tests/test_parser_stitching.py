@@ -0,0 +1,81 @@
+"""Entries whose details continue onto the next page, parsed serially and page by page with absorb."""
+import io
+import logging
+
+import pytest
+
+import mpesync
+from benchmarks.synthetic import _text_at, build_pdf, entry_text_lines, generate_entries
+
+logging.disable(logging.INFO)
+
+ENTRIES = list(generate_entries(12))
+LINES = [line for entry in ENTRIES for line in entry_text_lines(entry)]
+
+
+def fields(transactions):
+    return [(t.reference, t.date, t.time, t.amount_cents, t.name, t.account) for t in transactions]
+
+
+def expected():
+    return [(entry['reference'], entry['when'].date(), f"{entry['when']:%H:%M:%S}",
+             round(entry['amount'] * 100), entry['name'], entry['account']) for entry in ENTRIES]
+
+
+def parse_serially(pages):
+    parser = mpesync.TransactionParser()
+    transactions = []
+    for page in pages:
+        transactions.extend(parser.feed(page))
+    return transactions + parser.close()
+
+
+def parse_with_absorb(pages):
+    # As the process pool does: each page on its own parser, merged in page order
+    statement_format = mpesync.detect_statement_format(pages[0])
+    parser = mpesync.TransactionParser(statement_format=statement_format)
+    transactions = []
+    for page in pages:
+        page_parser = mpesync.TransactionParser(keep_leading_lines=True, statement_format=statement_format)
+        completed = page_parser.feed(page)
+        transactions.extend(parser.absorb(page_parser.leading_lines, completed, page_parser.take_open_transaction()))
+    return transactions + parser.close()
+
+
+# Each synthetic entry is four lines: header, "Funds received from ... Acc.",
+# account and "Completed <amount> <balance>"
+@pytest.mark.parametrize('break_after, continued', [
+    (1, 'the "Acc." details, account and amount'),
+    (2, 'the account and amount'),
+    (3, 'the "Completed <amount>" line'),
+    (4, 'nothing'),
+])
+@pytest.mark.parametrize('parse', [parse_serially, parse_with_absorb])
+def test_entry_continued_on_the_next_page(parse, break_after, continued):
+    split = 5 * 4 + break_after
+    pages = ['\n'.join(LINES[:split]), '\n'.join(LINES[split:])]
+    assert fields(parse(pages)) == expected(), f'page break before {continued}'
+
+
+@pytest.mark.parametrize('parse', [parse_serially, parse_with_absorb])
+def test_page_holding_only_the_rest_of_an_entry(parse):
+    # The middle page has no header at all
+    pages = ['\n'.join(LINES[:21]), '\n'.join(LINES[21:23]), '\n'.join(LINES[23:])]
+    assert fields(parse(pages)) == expected()
+
+
+@pytest.mark.parametrize('page_filter', [True, False])
+def test_process_pool_matches_serial(page_filter, monkeypatch):
+    monkeypatch.setattr(mpesync, 'PAGE_FILTER', page_filter)
+    monkeypatch.setattr(mpesync, 'PARALLEL_MIN_PAGES', 1)
+    entries = list(generate_entries(200))
+    lines = [line for entry in entries for line in entry_text_lines(entry)]
+    # 37 lines a page, so page breaks fall at every point within an entry
+    pdf_bytes = build_pdf([' '.join(_text_at(30, 810 - 10 * i, line) for i, line in enumerate(lines[start:start + 37]))
+                           for start in range(0, len(lines), 37)])
+
+    serial = mpesync.process_pdf(io.BytesIO(pdf_bytes), workers=0, backend='pypdf2')
+    parallel = mpesync.process_pdf(io.BytesIO(pdf_bytes), workers=3, backend='pypdf2')
+    assert len(serial) == len(entries)
+    assert fields(parallel) == fields(serial)
+    assert [t.amount_cents for t in serial] == [round(entry['amount'] * 100) for entry in entries]
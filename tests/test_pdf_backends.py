@@ -0,0 +1,25 @@
+"""pdf_backends used from several threads, as the gthread servers and job threads do."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.synthetic import generate_statement_pdf
+from pdf_backends import open_pdf
+
+pytest.importorskip('pypdfium2')
+
+
+def read_statement(pdf_bytes):
+    with open_pdf(pdf_bytes, 'pypdfium2') as document:
+        return [(document.page_text(page_num), document.page_words(page_num))
+                for page_num in range(document.page_count)]
+
+
+def test_pdfium_documents_read_from_threads_match_a_serial_read():
+    statements = [generate_statement_pdf(pages=4, layout=layout, seed=seed)
+                  for seed in range(4) for layout in ('text', 'table')]
+    expected = [read_statement(pdf_bytes) for pdf_bytes in statements]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(3):
+            assert list(executor.map(read_statement, statements)) == expected
@@ -0,0 +1,58 @@
+"""Statement layouts: format detection and the fields parsed from each layout."""
+import io
+import logging
+
+import pytest
+
+import mpesync
+from benchmarks.synthetic import generate_entries, generate_statement_pdf, organization_entry_line
+from pdf_backends import open_pdf
+
+logging.disable(logging.INFO)
+
+PAGES, PER_PAGE = 3, 20
+
+
+def expected(entries, with_accounts_for_withdrawals=True):
+    """(reference, date, time, signed amount in cents, name, account) of each synthetic entry."""
+    return [(entry['reference'], entry['when'].date(), f"{entry['when']:%H:%M:%S}",
+             round(entry['amount'] * 100) * (1 if entry['paid_in'] else -1), entry['name'],
+             entry['account'] if entry['paid_in'] or with_accounts_for_withdrawals else None)
+            for entry in entries]
+
+
+def parsed(transactions):
+    return [(t.reference, t.date, t.time, t.amount_cents, t.name, t.account) for t in transactions]
+
+
+@pytest.fixture(scope='module')
+def entries():
+    return list(generate_entries(PAGES * PER_PAGE))
+
+
+def test_organization_lines(entries):
+    lines = '\n'.join(organization_entry_line(entry) for entry in entries)
+    transactions = mpesync.extract_transaction_details(lines, mpesync.ORGANIZATION_FORMAT)
+    assert any(not entry['paid_in'] for entry in entries)
+    assert parsed(transactions) == expected(entries, with_accounts_for_withdrawals=False)
+
+
+def test_organization_statement_is_detected(entries):
+    pdf_bytes = generate_statement_pdf(pages=PAGES, per_page=PER_PAGE, layout='organization')
+    with open_pdf(pdf_bytes, 'pypdf2') as document:
+        assert mpesync.detect_statement_format(document.page_text(0)) is mpesync.ORGANIZATION_FORMAT
+
+    transactions = mpesync.process_pdf(io.BytesIO(pdf_bytes), workers=0, backend='pypdf2')
+    assert parsed(transactions) == expected(entries, with_accounts_for_withdrawals=False)
+
+
+def test_customer_statement_is_detected():
+    pdf_bytes = generate_statement_pdf(pages=PAGES, per_page=PER_PAGE)
+    with open_pdf(pdf_bytes, 'pypdf2') as document:
+        assert mpesync.detect_statement_format(document.page_text(0)) is mpesync.CUSTOMER_FORMAT
+
+    # Customer statements print the amount unsigned
+    transactions = mpesync.process_pdf(io.BytesIO(pdf_bytes), workers=0, backend='pypdf2')
+    assert [(t.reference, t.time, t.amount_cents, t.name, t.account) for t in transactions] == [
+        (reference, time_text, abs(cents), name, account)
+        for reference, _, time_text, cents, name, account in expected(generate_entries(PAGES * PER_PAGE))]
@@ -0,0 +1,86 @@
+"""TOTAL row of the Monthly Summary sheet on multi-year (wide) summaries."""
+import io
+import logging
+from datetime import date
+
+import openpyxl
+import pytest
+from xlsxwriter.utility import xl_col_to_name
+
+import mpesync
+from mpesync import Transaction
+
+logging.disable(logging.INFO)
+
+YEARS = 10
+NAMES = ['ALICE WANJIRU', 'BRIAN OTIENO', 'CAROL AKINYI']
+
+
+def ten_years_of_transactions():
+    """Two transactions a month per name over YEARS years: 120 month columns, well past column Z."""
+    transactions = []
+    for year in range(2015, 2015 + YEARS):
+        for month in range(1, 13):
+            for n, name in enumerate(NAMES):
+                for day in (3, 17):
+                    cents = 100 * (year - 2000) + 7 * month + 13 * n + day
+                    transactions.append(Transaction(f'S{year}{month:02d}{n}{day}', date(year, month, day),
+                                                    '12:00:00', cents, name, f'07{n:08d}'))
+    return transactions
+
+
+def write(writer, transactions):
+    if writer == 'pandas':
+        return mpesync.build_workbook(transactions)
+    output = io.BytesIO()
+    mpesync.write_workbook_streaming(transactions, output)
+    return output.getvalue()
+
+
+@pytest.fixture(scope='module')
+def transactions():
+    return ten_years_of_transactions()
+
+
+def summary_sheets(workbook_bytes):
+    """(formulas, cached values) views of the Monthly Summary sheet."""
+    formulas = openpyxl.load_workbook(io.BytesIO(workbook_bytes))['Monthly Summary']
+    values = openpyxl.load_workbook(io.BytesIO(workbook_bytes), data_only=True)['Monthly Summary']
+    return formulas, values
+
+
+@pytest.mark.parametrize('writer', ['pandas', 'streaming'])
+def test_formula_totals_address_every_column(monkeypatch, transactions, writer):
+    monkeypatch.setattr(mpesync, 'SUMMARY_TOTALS', 'formula')
+    formulas, _ = summary_sheets(write(writer, transactions))
+
+    keys = len(mpesync.SUMMARY_KEYS)
+    total_row = formulas.max_row
+    assert formulas.max_column == keys + YEARS * 12 + 1
+    assert formulas.cell(total_row, 1).value == 'TOTAL'
+    assert formulas.cell(1, formulas.max_column).value == 'Total'
+
+    for col_num in range(keys + 1, formulas.max_column + 1):
+        column = xl_col_to_name(col_num - 1)
+        assert formulas.cell(total_row, col_num).value == f'=SUM({column}2:{column}{total_row - 1})'
+
+    # Two-letter columns past Z, e.g. the last month (DR) and Total (DS)
+    assert formulas.cell(total_row, formulas.max_column).value == f'=SUM(DS2:DS{total_row - 1})'
+
+
+@pytest.mark.parametrize('writer', ['pandas', 'streaming'])
+@pytest.mark.parametrize('mode', ['formula', 'value'])
+def test_total_values_equal_column_sums(monkeypatch, transactions, writer, mode):
+    monkeypatch.setattr(mpesync, 'SUMMARY_TOTALS', mode)
+    formulas, values = summary_sheets(write(writer, transactions))
+
+    total_row = values.max_row
+    for col_num in range(len(mpesync.SUMMARY_KEYS) + 1, values.max_column + 1):
+        column_sum = sum(values.cell(row, col_num).value for row in range(2, total_row))
+        # Cached formula results and plain values both hold the sum
+        assert values.cell(total_row, col_num).value == pytest.approx(column_sum, abs=0.005)
+        if mode == 'value':
+            assert formulas.cell(total_row, col_num).data_type == 'n'
+
+    grand_total = sum(t.amount_cents for t in transactions) / 100
+    assert values.cell(total_row, values.max_column).value == pytest.approx(grand_total, abs=0.005)
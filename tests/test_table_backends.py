@@ -0,0 +1,52 @@
+"""The table converter's text path (pypdfium2 words split into cells) against pdfplumber's ruled cells."""
+import importlib.util
+import logging
+import os
+
+import pytest
+
+from benchmarks.synthetic import generate_statement_pdf
+
+pytest.importorskip('pypdfium2')
+pytest.importorskip('pdfplumber')
+
+logging.disable(logging.INFO)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def table_app():
+    spec = importlib.util.spec_from_file_location(
+        'mpesa_table_app', os.path.join(ROOT, 'Mpesa_pdf_to_excel', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('multiline_details', [True, False])
+def test_text_path_matches_pdfplumber(table_app, multiline_details):
+    pdf_bytes = generate_statement_pdf(pages=6, layout='table', multiline_details=multiline_details)
+    reference = table_app.extract_transactions(pdf_bytes, 'pdfplumber')
+    assert len(reference) == 6 * 20
+    assert table_app.extract_transactions(pdf_bytes, 'pypdfium2') == reference
+    assert table_app.choose_table_backend(pdf_bytes) == 'pypdfium2'
+
+
+def test_auto_keeps_pdfplumber_when_the_text_path_differs(table_app, monkeypatch):
+    pdf_bytes = generate_statement_pdf(pages=6, layout='table')
+    # Column starts well right of the labels put every cell in the wrong column
+    monkeypatch.setattr(table_app, 'COLUMN_TOLERANCE', -20)
+    assert table_app.choose_table_backend(pdf_bytes) == 'pdfplumber'
+    assert table_app.extract_transactions(pdf_bytes) == table_app.extract_transactions(pdf_bytes, 'pdfplumber')
+
+
+def test_short_statements_use_pdfplumber(table_app):
+    pdf_bytes = generate_statement_pdf(pages=1, layout='table')
+    assert table_app.choose_table_backend(pdf_bytes) == 'pdfplumber'
+
+
+def test_backends_that_cannot_read_tables_are_rejected(table_app):
+    assert table_app.table_backend('pypdfium2') == 'pypdfium2'
+    with pytest.raises(ValueError):
+        table_app.table_backend('pypdf2')
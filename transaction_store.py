@@ -0,0 +1,105 @@
+"""Persistent, partitioned Parquet store of parsed transactions.
+
+Each processed statement is written as one Parquet file per month under
+``<root>/year=YYYY/month=MM/<statement hash>.parquet``, so re-processing the
+same statement overwrites its files instead of duplicating them. Name and
+Account are dictionary encoded and amounts are stored as int64 cents.
+Queries prune partitions by month and read only the requested columns.
+
+Requires pyarrow (``pip install pyarrow``).
+"""
+import logging
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+STORE_COLUMNS = ['Reference', 'Date', 'Time', 'Name', 'Account', 'AmountCents']
+
+
+def transactions_to_frame(transactions):
+    """Convert parsed Transaction records to the store's compact column layout."""
+    return pd.DataFrame({
+        'Reference': [t.reference for t in transactions],
+        'Date': [t.date for t in transactions],
+        'Time': [t.time for t in transactions],
+        'Name': pd.Categorical([t.name for t in transactions]),
+        'Account': pd.Categorical([t.account for t in transactions]),
+        'AmountCents': pd.array([t.amount_cents for t in transactions], dtype='Int64'),
+    }, columns=STORE_COLUMNS)
+
+
+class TransactionStore:
+    """Parquet dataset of transactions partitioned by year and month."""
+
+    def __init__(self, root):
+        if pa is None:
+            raise RuntimeError('The transaction store requires pyarrow: pip install pyarrow')
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, transactions, statement_key):
+        """Store a statement's transactions; returns the number of partitions written."""
+        df = transactions_to_frame(transactions)
+        dates = pd.to_datetime(df['Date'])
+        partitions = 0
+        for (year, month), part in df.groupby([dates.dt.year, dates.dt.month]):
+            directory = os.path.join(self.root, f'year={year}', f'month={month:02d}')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{statement_key}.parquet')
+
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+            partitions += 1
+
+        logger.info(f"Stored {len(df)} transactions in {partitions} partitions")
+        return partitions
+
+    def query(self, start=None, end=None, columns=None):
+        """Read transactions between the ``start`` and ``end`` months ('YYYY-MM', inclusive).
+
+        Only partitions in range and the requested ``columns`` (default: all)
+        are read. Transactions listed in several statements are returned once.
+        """
+        columns = list(columns or STORE_COLUMNS)
+        unknown = [col for col in columns if col not in STORE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        if not any(name.startswith('year=') for name in os.listdir(self.root)):
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(self.root, format='parquet', partitioning='hive')
+        expression = None
+        if start:
+            expression = _month_bound(start, lower=True)
+        if end:
+            upper = _month_bound(end, lower=False)
+            expression = upper if expression is None else expression & upper
+
+        # Reference is always read so overlapping statements can be deduplicated
+        read_columns = columns if 'Reference' in columns else columns + ['Reference']
+        table = dataset.to_table(columns=read_columns, filter=expression)
+        df = table.to_pandas().drop_duplicates('Reference')
+        return df[columns].reset_index(drop=True)
+
+
+def _month_bound(month, lower):
+    """Partition filter for months on or after (lower) / on or before ``month``."""
+    year, month_num = (int(part) for part in month.split('-'))
+    year_field, month_field = ds.field('year'), ds.field('month')
+    if lower:
+        return (year_field > year) | ((year_field == year) & (month_field >= month_num))
+    return (year_field < year) | ((year_field == year) & (month_field <= month_num))
@@ -0,0 +1,27 @@
+"""Production WSGI entry point for both converters.
+
+Serve them with gunicorn and the settings in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:app          # app.py (/process, /batch, /jobs, ...)
+    gunicorn -c gunicorn.conf.py wsgi:table_app    # Mpesa_pdf_to_excel/app.py (/convert)
+
+``python app.py`` still starts the single-process development server.
+"""
+import importlib.util
+import os
+
+# Server workers run requests on threads; pools must not be forked from them
+os.environ.setdefault('MPESYNC_POOL_START_METHOD', 'forkserver')
+
+from app import app  # noqa: E402
+
+
+def _load_table_app():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Mpesa_pdf_to_excel', 'app.py')
+    spec = importlib.util.spec_from_file_location('mpesa_table_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+table_app = _load_table_app()